@@ -0,0 +1,174 @@
+"""Measure database size and analysis read latency with and without compression.
+
+Run from the backend directory:
+
+    python -m benchmarks.analysis_storage --analyses 20000 --reads 5000
+
+Synthetic reports following the structure of ANALYSIS_PROMPT are saved with
+ANALYSIS_COMPRESSION off and on, each into a fresh database. For both, the
+file size and the latency of load_analysis and of a history page are
+reported. The uncompressed database is then backdated and compacted (moving
+most analyses to the archive, compressing them on the way) to show the size
+after archival and incremental vacuum.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import zlib
+
+FOODS = [
+    "grilled chicken breast", "brown rice", "steamed broccoli", "avocado toast",
+    "scrambled eggs", "greek yogurt", "mixed berries", "salmon fillet", "quinoa",
+    "caesar salad", "beef burger", "sweet potato fries", "pasta carbonara",
+    "margherita pizza", "lentil soup", "tofu stir-fry", "banana", "oatmeal",
+]
+
+
+def make_report(rng: random.Random) -> str:
+    foods = rng.sample(FOODS, rng.randint(2, 4))
+    calories = rng.randint(250, 1100)
+    carbs, protein, fat = rng.randint(10, 120), rng.randint(5, 60), rng.randint(3, 50)
+    fiber, sugar, score = rng.randint(1, 15), rng.randint(1, 40), rng.randint(3, 9)
+    items = "\n".join(f"- {food.title()}: approximately {rng.randint(50, 300)} grams" for food in foods)
+    return f"""🔍 **FOOD IDENTIFICATION**
+
+{items}
+- **Estimated Portion Size:** one medium plate
+
+📊 **NUTRITIONAL BREAKDOWN**
+
+- **Total Estimated Calories:** approximately {calories} kcal
+- **Carbohydrates:** {carbs}g
+- **Protein:** {protein}g
+- **Fat:** {fat}g
+- **Fiber:** {fiber}g
+- **Sugar:** {sugar}g
+- **Key Vitamins and Minerals:** The {foods[0]} provides vitamin B6 and niacin, while the {foods[1]} adds potassium, magnesium and vitamin C.
+
+⚖️ **HEALTH ASSESSMENT**
+
+- **Overall Nutritional Quality:** {score}/10
+- **Health Benefits:** A good source of protein and complex carbohydrates, with healthy fats from the {foods[-1]}.
+- **Concerns:** The meal is relatively high in sodium and saturated fat depending on preparation.
+- **Allergen Information:** May contain gluten, dairy or eggs.
+
+💡 **RECOMMENDATIONS**
+
+- **Suggestions for Nutritional Balance:** Add a side of leafy greens to increase fiber and micronutrients.
+- **Complementary Foods:** A glass of water, a side salad or fresh fruit.
+- **Portion Recommendations:** Keep the {foods[0]} portion to about the size of your palm.
+
+🎯 **SUMMARY**
+
+- **Key Nutritional Highlights:** {calories} kcal with {protein}g of protein.
+- **Main Takeaway:** A reasonably balanced meal; more vegetables would improve it.
+
+```json
+{{"calories": {calories}, "carbs_g": {carbs}, "protein_g": {protein}, "fat_g": {fat}, "fiber_g": {fiber}, "sugar_g": {sugar}, "quality_score": {score}}}
+```"""
+
+
+def _file_size(path: str) -> int:
+    from config.database import db_connection
+
+    with db_connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(path)
+
+
+def _percentiles(samples: list[float]) -> dict:
+    samples.sort()
+    return {
+        "p50_us": round(statistics.median(samples) * 1e6, 1),
+        "p95_us": round(samples[int(len(samples) * 0.95)] * 1e6, 1),
+    }
+
+
+def _measure(label: str, reports: list[str], reads: int, compress: bool) -> str:
+    from config.settings import settings
+    from config.database import init_db, pool
+    from models.schemas import NutritionFacts
+    from routes.user import _fetch_history
+    from services.ai_service import load_analysis, save_analyses
+
+    pool.close()
+    settings.DATABASE_URL = os.path.join(tempfile.mkdtemp(), f"{label}.db")
+    settings.ANALYSIS_COMPRESSION = compress
+    init_db()
+
+    users = [f"user_{i}" for i in range(200)]
+    owners = {}
+    for batch, start in enumerate(range(0, len(reports), 50)):
+        user_id = users[batch % len(users)]
+        facts = NutritionFacts(calories=500)
+        for analysis_id in save_analyses(user_id, [(report, facts) for report in reports[start:start + 50]]):
+            owners[analysis_id] = user_id
+    rng = random.Random(1)
+    sample = rng.choices(list(owners), k=reads)
+    latencies = []
+    for analysis_id in sample:
+        start = time.perf_counter()
+        load_analysis(analysis_id, owners[analysis_id])
+        latencies.append(time.perf_counter() - start)
+    history = []
+    for user_id in rng.choices(users, k=reads):
+        start = time.perf_counter()
+        _fetch_history(user_id, 21, None)
+        history.append(time.perf_counter() - start)
+
+    print({
+        "mode": label,
+        "analyses": len(reports),
+        "db_bytes": _file_size(settings.DATABASE_URL),
+        "load_analysis": _percentiles(latencies),
+        "history_page": _percentiles(history),
+    })
+    return settings.DATABASE_URL
+
+
+def main(count: int, reads: int):
+    rng = random.Random(0)
+    reports = [make_report(rng) for _ in range(count)]
+
+    from utils.compression import DICTIONARIES, DEFAULT_VERSION, compress_text
+
+    raw = sum(len(report.encode()) for report in reports)
+    plain_zlib = sum(len(zlib.compress(report.encode(), 9)) for report in reports)
+    with_dict = sum(len(compress_text(report)) for report in reports)
+    print({
+        "text_bytes": raw,
+        "zlib_bytes": plain_zlib,
+        "zlib_with_dictionary_bytes": with_dict,
+        "dictionary_bytes": len(DICTIONARIES[DEFAULT_VERSION]),
+    })
+
+    path = _measure("uncompressed", reports, reads, compress=False)
+    _measure("compressed", reports, reads, compress=True)
+
+    # Archive 80% of the uncompressed database, compressing on the way
+    from config.database import db_connection, pool
+    from config.settings import settings
+    from services.compaction import compact
+
+    pool.close()
+    settings.DATABASE_URL = path
+    settings.ANALYSIS_COMPRESSION = True
+    with db_connection() as conn:
+        conn.execute(
+            "UPDATE analyses SET created_at = DATETIME('now', '-400 days') WHERE rowid <= ?",
+            (int(count * 0.8),),
+        )
+    result = compact()
+    print({"mode": "uncompressed_after_compaction", **result, "db_bytes": _file_size(path)})
+    pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyses", type=int, default=20000)
+    parser.add_argument("--reads", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.analyses, args.reads)
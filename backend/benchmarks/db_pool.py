@@ -0,0 +1,103 @@
+"""Compare per-request SQLite connections with the shared pool under load.
+
+Run from the backend directory:
+
+    python -m benchmarks.db_pool --concurrency 50 --requests 2000
+
+The baseline runs on the event loop, so its per-request latency excludes the
+time other requests spent waiting for the blocked loop; compare throughput.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+
+def _rate_limit_query(conn: sqlite3.Connection, user_id: str):
+    """The read-then-write pattern of the rate limiter"""
+    today = str(datetime.now().date())
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT daily_requests, last_request_date FROM user_usage WHERE user_id = ?",
+        (user_id,),
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(
+            "INSERT INTO user_usage (user_id, email, daily_requests, last_request_date) VALUES (?, ?, 0, ?)",
+            (user_id, f"{user_id}@example.com", today),
+        )
+    cursor.execute(
+        "UPDATE user_usage SET daily_requests = daily_requests + 1, total_requests = total_requests + 1 WHERE user_id = ?",
+        (user_id,),
+    )
+    conn.commit()
+
+
+async def _run(label: str, handler, concurrency: int, total: int) -> dict:
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await handler(f"user_{i % 200}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "mode": label,
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+    }
+
+
+async def main(concurrency: int, total: int):
+    from config.settings import settings
+
+    settings.DATABASE_URL = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    from config.database import init_db, db_connection, run_db, pool
+
+    init_db()
+
+    async def per_request_connect(user_id: str):
+        # Baseline: a fresh connection, executed directly on the event loop
+        conn = sqlite3.connect(settings.DATABASE_URL)
+        try:
+            _rate_limit_query(conn, user_id)
+        finally:
+            conn.close()
+
+    def pooled_query(user_id: str):
+        with db_connection() as conn:
+            _rate_limit_query(conn, user_id)
+
+    async def pooled(user_id: str):
+        await run_db(pooled_query, user_id)
+
+    results = [
+        await _run("per_request_connect", per_request_connect, concurrency, total),
+        await _run("pooled", pooled, concurrency, total),
+    ]
+    pool.close()
+
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.requests))
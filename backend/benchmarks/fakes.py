@@ -0,0 +1,147 @@
+"""Local stand-ins for Gemini and Clerk used by the benchmarks.
+
+``FakeChatModel`` replaces ``services.ai_service.llm`` and ``install_fake_clerk``
+replaces the HTTP client behind ``services.clerk_client.clerk_users``; both
+take a latency, jitter and error rate so upstream behaviour can be simulated.
+"""
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+import httpx
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FAKE_REPORT = """🔍 **FOOD IDENTIFICATION**
+- Grilled salmon fillet (about 150g)
+- Steamed jasmine rice (about 1 cup)
+- Broccoli florets (about 80g)
+
+📊 **NUTRITIONAL BREAKDOWN**
+- Total estimated calories: 610 kcal
+- Carbohydrates: 58g, Protein: 42g, Fat: 21g
+- Rich in vitamin D, B12, selenium and vitamin C
+- Fiber: 4g, Sugar: 2g
+
+⚖️ **HEALTH ASSESSMENT**
+- Overall nutritional quality: 8/10
+- High-quality protein and omega-3 fatty acids
+- Allergens: fish
+
+💡 **RECOMMENDATIONS**
+- Swap half the rice for a whole grain to add fiber
+- Add a side salad for more micronutrients
+
+🎯 **SUMMARY**
+- A balanced, protein-rich meal
+- Main takeaway: keep the portion of rice moderate
+
+```json
+{"calories": 610, "carbs_g": 58, "protein_g": 42, "fat_g": 21, "fiber_g": 4, "sugar_g": 2, "quality_score": 8}
+```
+"""
+
+
+class FakeUpstreamError(Exception):
+    """Injected upstream failure (a 503, so the resilience layer retries it)"""
+
+    code = 503
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that returns a canned report after a simulated delay"""
+
+    latency: float = 1.0  # seconds until the full response is ready
+    jitter: float = 0.2  # +/- seconds of uniform noise
+    error_rate: float = 0.0
+    tail_rate: float = 0.0  # fraction of calls that straggle
+    tail_latency: float = 10.0  # seconds taken by a straggling call
+    chunk_size: int = 40  # characters per streamed chunk
+    report: str = FAKE_REPORT
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _delay(self) -> float:
+        if random.random() < self.error_rate:
+            raise FakeUpstreamError("Injected upstream error")
+        if random.random() < self.tail_rate:
+            return self.tail_latency
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.report))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.report))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        chunks = self._chunks()
+        delay = self._delay() / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self._chunks()
+        delay = self._delay() / len(chunks)
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    def _chunks(self) -> List[str]:
+        return [
+            self.report[i:i + self.chunk_size]
+            for i in range(0, len(self.report), self.chunk_size)
+        ]
+
+
+def install_fake_clerk(latency: float = 0.05, jitter: float = 0.01, error_rate: float = 0.0):
+    """Point the Clerk user lookup at an in-process fake users API"""
+    from config.settings import settings
+    from services.clerk_client import clerk_users
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        if random.random() < error_rate:
+            return httpx.Response(503, text="Injected upstream error")
+        user_id = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(
+            200, json={"id": user_id, "email_addresses": [{"email_address": f"{user_id}@example.com"}]}
+        )
+
+    clerk_users._client = httpx.AsyncClient(
+        base_url=settings.CLERK_API_URL, transport=httpx.MockTransport(handler)
+    )
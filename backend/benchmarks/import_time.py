@@ -0,0 +1,85 @@
+"""Measure how long ``import main`` takes and guard it against regressions.
+
+Run from the backend directory:
+
+    python -m benchmarks.import_time --runs 5 --max-ms 1500
+
+Each run imports the app in a fresh interpreter. The script exits non-zero if
+the median import time exceeds ``--max-ms`` or if any module that should load
+lazily (LangChain, ReportLab, Pillow) is imported at startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must stay out of the import-time path of main.py
+LAZY_MODULES = ("langchain_google_genai", "langchain_core", "reportlab", "PIL")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+loaded = [name for name in {lazy!r} if name in sys.modules]
+print(elapsed * 1000, ",".join(loaded))
+"""
+
+
+def _run_once(env: dict) -> tuple[float, list[str]]:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(lazy=LAZY_MODULES)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1]
+    elapsed, _, loaded = output.partition(" ")
+    return float(elapsed), [name for name in loaded.split(",") if name]
+
+
+def _slowest_imports(env: dict, limit: int) -> list[tuple[int, str]]:
+    """Top modules by cumulative import time, from ``python -X importtime``"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(args) -> int:
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark"))
+
+    # Warm the bytecode cache so every measured run starts from the same state
+    _run_once(env)
+    timings = []
+    loaded = []
+    for _ in range(args.runs):
+        elapsed, loaded = _run_once(env)
+        timings.append(elapsed)
+
+    median = statistics.median(timings)
+    print(f"import main: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms")
+    for cumulative, name in _slowest_imports(env, args.top):
+        print(f"  {cumulative / 1000:>9.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at startup: {', '.join(loaded)}")
+        failed = True
+    if args.max_ms and median > args.max_ms:
+        print(f"FAIL: median import time {median:.1f} ms exceeds {args.max_ms} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=0, help="fail above this median (0 disables)")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    sys.exit(main(parser.parse_args()))
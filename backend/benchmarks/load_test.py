@@ -0,0 +1,242 @@
+"""Offline load test of the API against fake Gemini and Clerk upstreams.
+
+The FastAPI app runs in-process (no network, no API quota) and is driven by
+concurrent clients over an ASGI transport. Throughput, latency percentiles and
+peak RSS are printed and written to a JSON file so runs can be diffed across
+versions. Run from the backend directory:
+
+    python -m benchmarks.load_test --concurrency 20 --requests 200
+    python -m benchmarks.load_test --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+SCENARIOS = ("analyze_image", "generate_pdf", "user_profile", "admin_stats")
+ADMIN_USER_ID = "bench_admin"
+
+
+def _configure_environment(workdir: str):
+    """Point the app at throwaway storage before it is imported"""
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ["ADMIN_USER_ID"] = ADMIN_USER_ID
+    os.environ["PDF_CACHE_DIR"] = os.path.join(workdir, "pdf_cache")
+    os.environ["THUMBNAIL_DIR"] = os.path.join(workdir, "thumbnails")
+
+    from config.settings import settings
+
+    settings.DATABASE_URL = os.path.join(workdir, "bench.db")
+    settings.THUMBNAIL_DIR = os.environ["THUMBNAIL_DIR"]
+    settings.ADMIN_USER_ID = ADMIN_USER_ID
+    settings.DAILY_LIMIT = 10**9
+
+
+def _make_images(count: int) -> list[bytes]:
+    from PIL import Image
+
+    images = []
+    for i in range(count):
+        buffer = BytesIO()
+        color = (random.randrange(256), random.randrange(256), i % 256)
+        Image.new("RGB", (1600, 1200), color).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def _token(user_id: str) -> str:
+    import jwt
+
+    claims = {"sub": user_id, "exp": int(time.time()) + 3600}
+    return jwt.encode(claims, "offline-benchmark-signing-key-0000", algorithm="HS256")
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+async def _run_scenario(client, name: str, concurrency: int, total: int, args, images) -> dict:
+    latencies = []
+    statuses: dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def one(i: int):
+        user_id = ADMIN_USER_ID if name == "admin_stats" else f"bench_user_{i % args.users}"
+        headers = {"Authorization": f"Bearer {_token(user_id)}"}
+        image = images[i % len(images)]
+        if name == "analyze_image":
+            return await client.post(
+                "/analyze-image", headers=headers,
+                files={"file": ("meal.jpg", image, "image/jpeg")},
+            )
+        if name == "generate_pdf":
+            return await client.post(
+                "/generate-pdf", headers=headers,
+                files={"file": ("meal.jpg", image, "image/jpeg")},
+                data={"analysis_text": args.report_text},
+            )
+        if name == "user_profile":
+            return await client.get("/user/profile", headers=headers)
+        return await client.get("/admin/stats", headers=headers)
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await one(i)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+            "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        },
+        "status_codes": statuses,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(current: dict, baseline_path: str):
+    baseline = json.loads(Path(baseline_path).read_text())
+    print(f"\nCompared with {baseline_path} ({baseline.get('git_commit')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        for metric, now, then in (
+            ("throughput_rps", result["throughput_rps"], before["throughput_rps"]),
+            ("p95_ms", result["latency_ms"]["p95"], before["latency_ms"]["p95"]),
+        ):
+            change = (now - then) / then * 100 if then else 0.0
+            print(f"  {name:14} {metric:15} {then:>10} -> {now:>10} ({change:+.1f}%)")
+
+
+async def main(args) -> dict:
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="nutrition-bench-")
+    _configure_environment(workdir)
+
+    import main as app_module
+    from benchmarks.fakes import FakeChatModel, install_fake_clerk
+    from config.database import init_db, pool
+    from services import ai_service
+    from services.pdf_service import shutdown_renderers
+    from config.settings import settings
+
+    # ASGITransport does not run the app lifespan
+    init_db()
+    ai_service.llm = FakeChatModel(
+        latency=args.llm_latency, jitter=args.llm_jitter, error_rate=args.llm_error_rate,
+        tail_rate=args.llm_tail_rate, tail_latency=args.llm_tail_latency,
+    )
+    install_fake_clerk(
+        latency=args.clerk_latency, jitter=args.clerk_jitter, error_rate=args.clerk_error_rate
+    )
+
+    random.seed(args.seed)
+    images = _make_images(args.unique_images)
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in args.scenarios:
+            results[name] = await _run_scenario(
+                client, name, args.concurrency, args.requests, args, images
+            )
+            print(f"{name:14} {results[name]['throughput_rps']:>9} req/s  "
+                  f"p50 {results[name]['latency_ms']['p50']:>9} ms  "
+                  f"p95 {results[name]['latency_ms']['p95']:>9} ms  "
+                  f"p99 {results[name]['latency_ms']['p99']:>9} ms  "
+                  f"{results[name]['status_codes']}")
+
+    shutdown_renderers()
+    pool.close()
+
+    # ru_maxrss is in KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS {peak_rss_mb:.1f} MB")
+
+    return {
+        "app_version": settings.APP_VERSION,
+        "git_commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "compare", "report_text")
+        },
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "scenarios": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--unique-images", type=int, default=20,
+                        help="distinct images; fewer than --requests exercises the analysis cache")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--llm-jitter", type=float, default=0.3)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-tail-rate", type=float, default=0.0,
+                        help="fraction of LLM calls that take --llm-tail-latency")
+    parser.add_argument("--llm-tail-latency", type=float, default=10.0)
+    parser.add_argument("--clerk-latency", type=float, default=0.05)
+    parser.add_argument("--clerk-jitter", type=float, default=0.02)
+    parser.add_argument("--clerk-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/load_test-<time>.json)")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    from benchmarks.fakes import FAKE_REPORT
+
+    args.report_text = FAKE_REPORT
+    report = asyncio.run(main(args))
+
+    output = Path(args.output or Path(__file__).parent / "results" / f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"results written to {output}")
+
+    if args.compare:
+        _compare(report, args.compare)
@@ -0,0 +1,196 @@
+"""Compare report rendering with the previous renderer, and measure summaries.
+
+Run from the backend directory:
+
+    python -m benchmarks.pdf_render --runs 5 --analyses 30 300
+
+The single-analysis report is rendered by the previous implementation
+(embedded below: full-resolution PNG, one Spacer per line, whole story built
+up front) and by the current one, for a camera-sized JPEG and a PNG. The
+summary report is then rendered over a temporary database for each
+``--analyses`` count; its peak Python memory should stay roughly flat as the
+count grows, since analyses are read and laid out a batch at a time.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+ANALYSIS_TEXT = "\n".join([
+    "🔍 Food Identification",
+    "Grilled salmon fillet with roasted vegetables and a side of quinoa.",
+    "📊 Nutritional Breakdown",
+    "Calories: 620 kcal",
+    "Carbohydrates: 48 g",
+    "Protein: 42 g",
+    "Fat: 26 g",
+    "Fiber: 7 g",
+    "Sugar: 6 g",
+    "⚖️ Health Assessment",
+    "A balanced meal rich in omega-3 fatty acids and complete protein.",
+    "Quality score: 8/10",
+    "💡 Suggestions",
+    "Add leafy greens for extra micronutrients.",
+    "🎯 Summary",
+    "A nutritious, well-portioned dinner.",
+])
+
+
+class LegacyPDFGenerator:
+    """The report renderer as it was before print-resolution JPEG embedding"""
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+        self.styles = getSampleStyleSheet()
+        self.styles.add(ParagraphStyle(
+            name='CustomTitle', parent=self.styles['Heading1'], fontSize=20,
+            spaceAfter=20, textColor=colors.HexColor('#2C5F60'), alignment=1,
+        ))
+        self.styles.add(ParagraphStyle(
+            name='CustomSection', parent=self.styles['Heading2'], fontSize=14,
+            spaceBefore=15, spaceAfter=8, textColor=colors.HexColor('#5F9EA0'),
+        ))
+
+    def create_pdf(self, image_data, analysis_text, user_email, report_date=None) -> bytes:
+        from PIL import Image as PILImage
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8*inch)
+        story = [
+            Paragraph("🍽️ AI Nutrition Analysis Report", self.styles['CustomTitle']),
+            Spacer(1, 20),
+        ]
+        date_str = (report_date or datetime.now()).strftime("%B %d, %Y")
+        story.append(Paragraph(f"Generated on {date_str} for {user_email}", self.styles['Normal']))
+        story.append(Spacer(1, 20))
+
+        pil_img = PILImage.open(BytesIO(image_data))
+        max_width = 4 * inch
+        img_width, img_height = pil_img.size
+        aspect_ratio = img_width / img_height
+        if img_width > img_height:
+            width, height = max_width, max_width / aspect_ratio
+        else:
+            width, height = max_width * aspect_ratio, max_width
+        png = BytesIO()
+        pil_img.save(png, format='PNG')
+        png.seek(0)
+        img = Image(png, width=width, height=height)
+        img.hAlign = 'CENTER'
+        story.extend([img, Spacer(1, 20)])
+
+        story.append(Paragraph("📊 Analysis Results", self.styles['CustomSection']))
+        for line in analysis_text.split('\n'):
+            if line.strip():
+                if any(emoji in line for emoji in ['🔍', '📊', '⚖️', '💡', '🎯']):
+                    story.append(Paragraph(line, self.styles['CustomSection']))
+                else:
+                    story.append(Paragraph(line, self.styles['Normal']))
+                story.append(Spacer(1, 5))
+        story.append(Spacer(1, 30))
+        story.append(Paragraph(
+            "<i>This analysis is AI-generated for educational purposes only.</i>",
+            self.styles['Normal'],
+        ))
+        doc.build(story)
+        return buffer.getvalue()
+
+
+def _photo(width: int, height: int, fmt: str) -> bytes:
+    """A noisy gradient that compresses roughly like a real photo"""
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(0)
+    noise = Image.frombytes("RGB", (width // 4, height // 4), rng.randbytes(width * height * 3 // 16))
+    img = noise.resize((width, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(2))
+    buffer = BytesIO()
+    img.save(buffer, format=fmt, quality=90)
+    return buffer.getvalue()
+
+
+def _time(render, runs: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pdf = render()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(pdf)
+
+
+def _seed(user_id: str, count: int, image: bytes):
+    from config.database import db_connection
+    from services.ai_service import save_analyses
+    from services.blob_store import thumbnail_store
+    from models.schemas import NutritionFacts
+    from utils.image_processing import make_thumbnail
+
+    thumbnail_hash = thumbnail_store.put(make_thumbnail(image))
+    facts = NutritionFacts(calories=620, carbs_g=48, protein_g=42, fat_g=26)
+    ids = save_analyses(
+        user_id, [(ANALYSIS_TEXT, facts)] * count, thumbnails=[thumbnail_hash] * count
+    )
+    # Spread the analyses over the last week
+    now = datetime.now(timezone.utc)
+    with db_connection() as conn:
+        conn.executemany(
+            "UPDATE analyses SET created_at = ? WHERE id = ?",
+            [((now - timedelta(hours=i * 168 / count)).strftime("%Y-%m-%d %H:%M:%S"), analysis_id)
+             for i, analysis_id in enumerate(ids)],
+        )
+
+
+def main(runs: int, counts: list[int]):
+    from config.settings import settings
+
+    workdir = tempfile.mkdtemp()
+    settings.DATABASE_URL = os.path.join(workdir, "bench.db")
+    settings.THUMBNAIL_DIR = os.path.join(workdir, "thumbnails")
+
+    from config.database import init_db, pool
+    from services.pdf_generator import SimplePDFGenerator
+    from services.pdf_service import render_summary_pdf
+
+    init_db()
+    legacy, current = LegacyPDFGenerator(), SimplePDFGenerator()
+
+    for label, image in (("jpeg_4000x3000", _photo(4000, 3000, "JPEG")),
+                         ("png_1600x1200", _photo(1600, 1200, "PNG"))):
+        for name, generator in (("legacy", legacy), ("current", current)):
+            ms, size = _time(lambda: generator.create_pdf(image, ANALYSIS_TEXT, "bench@example.com"), runs)
+            print({"report": label, "renderer": name, "median_ms": round(ms, 1), "pdf_bytes": size})
+
+    image = _photo(4000, 3000, "JPEG")
+    end = datetime.now(timezone.utc).date()
+    for count in counts:
+        user_id = f"user_{uuid.uuid4().hex[:8]}"
+        _seed(user_id, count, image)
+        tracemalloc.start()
+        start = time.perf_counter()
+        pdf = render_summary_pdf(user_id, "bench@example.com", end - timedelta(days=7), end)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print({
+            "report": "summary", "analyses": count, "ms": round(elapsed * 1000, 1),
+            "pdf_bytes": len(pdf), "peak_python_mb": round(peak / 2**20, 2),
+        })
+    pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--analyses", type=int, nargs="+", default=[30, 300])
+    args = parser.parse_args()
+    main(args.runs, args.analyses)
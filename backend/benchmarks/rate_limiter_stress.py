@@ -0,0 +1,98 @@
+"""Concurrency stress test for the rate limiter.
+
+Several processes (standing in for uvicorn workers) each run many threads that
+hammer ``check_rate_limit`` for the same users against one SQLite file. The
+number of granted requests per user must never exceed ``DAILY_LIMIT``, and
+refunded slots must become available again. Run from the backend directory:
+
+    python -m benchmarks.rate_limiter_stress --workers 4 --threads 16
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _worker(db_path: str, users: list[str], attempts: int, threads: int, results):
+    from config.settings import settings
+
+    settings.DATABASE_URL = db_path
+    from services.rate_limiter import check_rate_limit
+
+    def attempt(user_id: str) -> bool:
+        return check_rate_limit(user_id, f"{user_id}@example.com")[0]
+
+    jobs = [user for user in users for _ in range(attempts)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        granted = list(executor.map(attempt, jobs))
+    elapsed = time.perf_counter() - start
+
+    counts = {}
+    for user_id, ok in zip(jobs, granted):
+        counts[user_id] = counts.get(user_id, 0) + ok
+    results.put((counts, elapsed))
+
+
+def main(workers: int, threads: int, users: int, attempts: int) -> int:
+    from config.settings import settings
+
+    db_path = os.path.join(tempfile.mkdtemp(), "stress.db")
+    settings.DATABASE_URL = db_path
+    from config.database import init_db
+
+    init_db()
+
+    user_ids = [f"user_{i}" for i in range(users)]
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_worker, args=(db_path, user_ids, attempts, threads, results)
+        )
+        for _ in range(workers)
+    ]
+
+    for process in processes:
+        process.start()
+    totals = {user_id: 0 for user_id in user_ids}
+    elapsed = 0.0
+    for _ in processes:
+        counts, worker_elapsed = results.get()
+        elapsed = max(elapsed, worker_elapsed)
+        for user_id, granted in counts.items():
+            totals[user_id] += granted
+    for process in processes:
+        process.join()
+
+    calls = workers * users * attempts
+    print(f"{calls} calls in {elapsed:.2f}s ({calls / elapsed:.0f} calls/s)")
+
+    over_limit = {u: n for u, n in totals.items() if n > settings.DAILY_LIMIT}
+    under_limit = {u: n for u, n in totals.items() if n < settings.DAILY_LIMIT}
+    if over_limit or under_limit:
+        print(f"FAIL: over limit {over_limit}, under limit {under_limit}")
+        return 1
+
+    # A refunded slot must be grantable exactly once more
+    from services.rate_limiter import check_rate_limit, refund_requests
+
+    refund_requests(user_ids[0])
+    if not check_rate_limit(user_ids[0], "")[0] or check_rate_limit(user_ids[0], "")[0]:
+        print("FAIL: refund did not restore exactly one slot")
+        return 1
+
+    print(f"OK: every user was granted exactly {settings.DAILY_LIMIT} requests")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--attempts", type=int, default=10, help="attempts per user per worker")
+    args = parser.parse_args()
+    sys.exit(main(args.workers, args.threads, args.users, args.attempts))
@@ -0,0 +1,69 @@
+"""Measure analysis search latency and index rebuild time at scale.
+
+Run from the backend directory:
+
+    python -m benchmarks.search --analyses 200000 --users 2000 --queries 2000
+
+Synthetic reports (see benchmarks.analysis_storage) are saved through
+save_analyses, which indexes them as they are inserted. Search latency is
+then measured for common, rare, multi-word and prefix queries by random
+users, and finally the index is rebuilt from scratch.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.analysis_storage import make_report
+
+QUERIES = ["salmon", "gluten", "brown rice", "protein vitamin", "carbon*", "xylophone"]
+
+
+def main(count: int, users: int, queries: int):
+    from config.settings import settings
+
+    settings.DATABASE_URL = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    from config.database import db_connection, init_db, pool
+    from models.schemas import NutritionFacts
+    from services.ai_service import save_analyses
+    from services.search import rebuild, search_analyses
+
+    init_db()
+    rng = random.Random(0)
+    user_ids = [f"user_{i:05d}" for i in range(users)]
+    facts = NutritionFacts(calories=500)
+    start = time.perf_counter()
+    for offset in range(0, count, 20):
+        batch = [(make_report(rng), facts) for _ in range(min(20, count - offset))]
+        save_analyses(rng.choice(user_ids), batch)
+    print({"analyses": count, "users": users, "insert_seconds": round(time.perf_counter() - start, 1)})
+
+    with db_connection() as conn:
+        for query in QUERIES:
+            latencies, hits = [], 0
+            for user_id in rng.choices(user_ids, k=queries):
+                start = time.perf_counter()
+                hits += len(search_analyses(conn, user_id, query, 21, 0))
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            print({
+                "query": query,
+                "avg_hits": round(hits / queries, 1),
+                "p50_ms": round(statistics.median(latencies) * 1000, 2),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+            })
+
+    print({"rebuild": rebuild()})
+    pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyses", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.analyses, args.users, args.queries)
@@ -1,10 +1,29 @@
+import asyncio
+import functools
+import queue
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, TypeVar
 from config.settings import settings
+from utils.helpers import make_preview
+
+T = TypeVar("T")
+
+# Columns shared by ``analyses`` and ``analyses_archive`` (see the all_analyses view)
+ANALYSIS_COLUMNS = (
+    "id, user_id, analysis_result, created_at, preview, calories, carbs_g, "
+    "protein_g, fat_g, fiber_g, sugar_g, quality_score, thumbnail_hash"
+)
+
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(settings.DATABASE_URL)
+    conn = get_db_connection()
     cursor = conn.cursor()
+    # Serialize schema setup and backfills across workers starting together
+    cursor.execute("BEGIN IMMEDIATE")
     
     # User usage table
     cursor.execute("""
@@ -28,9 +47,290 @@ def init_db():
         )
     """)
     
+    # Analysis result cache (persistent tier of services.analysis_cache)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            cache_key TEXT PRIMARY KEY,
+            analysis_result TEXT,
+            created_at REAL
+        )
+    """)
+
+    # Preview column for the history view, computed once at insert time
+    if _add_column(cursor, "analyses", "preview", "TEXT"):
+        last_rowid = 0
+        while True:
+            cursor.execute(
+                "SELECT rowid, analysis_result FROM analyses WHERE rowid > ? ORDER BY rowid LIMIT 1000",
+                (last_rowid,),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE analyses SET preview = ? WHERE rowid = ?",
+                [(make_preview(result or ""), rowid) for rowid, result in rows],
+            )
+            last_rowid = rows[-1][0]
+
+    # Structured nutrition facts extracted from each report
+    for column in ("calories", "carbs_g", "protein_g", "fat_g", "fiber_g", "sugar_g", "quality_score"):
+        _add_column(cursor, "analyses", column, "REAL")
+
+    # Content hash of the analysis thumbnail (services.blob_store)
+    _add_column(cursor, "analyses", "thumbnail_hash", "TEXT")
+
+    # Analyses older than ARCHIVE_AFTER_DAYS, moved here by services.compaction
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS analyses_archive (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            analysis_result TEXT,
+            created_at TIMESTAMP,
+            preview TEXT,
+            calories REAL,
+            carbs_g REAL,
+            protein_g REAL,
+            fat_g REAL,
+            fiber_g REAL,
+            sugar_g REAL,
+            quality_score REAL,
+            thumbnail_hash TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyses_archive_user_history ON analyses_archive (user_id, created_at, id)")
+    cursor.execute(f"""
+        CREATE VIEW IF NOT EXISTS all_analyses AS
+        SELECT {ANALYSIS_COLUMNS} FROM analyses
+        UNION ALL
+        SELECT {ANALYSIS_COLUMNS} FROM analyses_archive
+    """)
+
+    # Full-text index of analysis text (services.search). Contentless: terms
+    # are derived from the plain text on insert, as it is stored compressed.
+    # Existing analyses are indexed by `python -m services.search --rebuild`.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS analyses_fts_map (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,  -- rowid in analyses_fts
+            analysis_id TEXT NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+            terms, content='', tokenize='unicode61 remove_diacritics 0'
+        )
+    """)
+
+    # Indexes for keyset-paginated history, date-range counts, archival and top users
+    cursor.execute("DROP INDEX IF EXISTS idx_analyses_user_created")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyses_user_history ON analyses (user_id, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_usage_total_requests ON user_usage (total_requests)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at, id)")
+
+    # Aggregates maintained by triggers so /admin/stats never scans the big tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day DATE PRIMARY KEY,
+            analyses INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_totals (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_analyses_daily_stats AFTER INSERT ON analyses
+        BEGIN
+            INSERT INTO daily_stats (day, analyses) VALUES (DATE(NEW.created_at), 1)
+            ON CONFLICT (day) DO UPDATE SET analyses = analyses + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_usage_totals AFTER INSERT ON user_usage
+        BEGIN
+            UPDATE stats_totals SET value = value + 1 WHERE name = 'users';
+        END
+    """)
+
+    # Per-user daily nutrition rollup, maintained on insert
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_daily_nutrition (
+            user_id TEXT NOT NULL,
+            day DATE NOT NULL,
+            analyses INTEGER NOT NULL DEFAULT 0,
+            calories REAL NOT NULL DEFAULT 0,
+            carbs_g REAL NOT NULL DEFAULT 0,
+            protein_g REAL NOT NULL DEFAULT 0,
+            fat_g REAL NOT NULL DEFAULT 0,
+            fiber_g REAL NOT NULL DEFAULT 0,
+            sugar_g REAL NOT NULL DEFAULT 0,
+            quality_score_sum REAL NOT NULL DEFAULT 0,
+            rated_analyses INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_analyses_daily_nutrition AFTER INSERT ON analyses
+        WHEN NEW.calories IS NOT NULL
+        BEGIN
+            INSERT INTO user_daily_nutrition (
+                user_id, day, analyses, calories, carbs_g, protein_g, fat_g,
+                fiber_g, sugar_g, quality_score_sum, rated_analyses
+            )
+            VALUES (
+                NEW.user_id, DATE(NEW.created_at), 1, NEW.calories,
+                COALESCE(NEW.carbs_g, 0), COALESCE(NEW.protein_g, 0), COALESCE(NEW.fat_g, 0),
+                COALESCE(NEW.fiber_g, 0), COALESCE(NEW.sugar_g, 0),
+                COALESCE(NEW.quality_score, 0), NEW.quality_score IS NOT NULL
+            )
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                analyses = analyses + 1,
+                calories = calories + excluded.calories,
+                carbs_g = carbs_g + excluded.carbs_g,
+                protein_g = protein_g + excluded.protein_g,
+                fat_g = fat_g + excluded.fat_g,
+                fiber_g = fiber_g + excluded.fiber_g,
+                sugar_g = sugar_g + excluded.sugar_g,
+                quality_score_sum = quality_score_sum + excluded.quality_score_sum,
+                rated_analyses = rated_analyses + excluded.rated_analyses;
+        END
+    """)
+
+    # Queued analyses (services.job_queue); image is cleared once a job finishes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            image BLOB,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            locked_until REAL,
+            analysis_id TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs (status, created_at)")
+
+    # Backfill the aggregates once for databases created before they existed
+    cursor.execute("SELECT 1 FROM stats_totals WHERE name = 'users'")
+    if cursor.fetchone() is None:
+        cursor.execute("INSERT INTO stats_totals (name, value) SELECT 'users', COUNT(*) FROM user_usage")
+        cursor.execute("DELETE FROM daily_stats")
+        cursor.execute("""
+            INSERT INTO daily_stats (day, analyses)
+            SELECT DATE(created_at), COUNT(*) FROM analyses GROUP BY DATE(created_at)
+        """)
+
     conn.commit()
     conn.close()
 
+def _add_column(cursor, table: str, column: str, definition: str) -> bool:
+    """Add a column to an existing table; returns True if it was missing"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if any(row[1] == column for row in cursor.fetchall()):
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
 def get_db_connection():
-    """Get database connection"""
-    return sqlite3.connect(settings.DATABASE_URL)
\ No newline at end of file
+    """Open a new, dedicated database connection.
+
+    Request handlers should use the shared pool (``db_connection`` / ``run_db``)
+    instead; this is for one-off work such as schema setup and scripts.
+    """
+    conn = sqlite3.connect(
+        settings.DATABASE_URL,
+        timeout=settings.DB_BUSY_TIMEOUT / 1000,
+        check_same_thread=False,
+        cached_statements=settings.DB_STATEMENT_CACHE_SIZE,
+    )
+    # Lets services.compaction return freed pages to the OS. Only takes effect
+    # when the file is created, i.e. before journal_mode writes its header.
+    # Databases created before this must be converted once by hand with
+    # `python -m services.compaction --convert` (app stopped); until then the
+    # compaction loop archives but never gives space back
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={settings.DB_BUSY_TIMEOUT}")
+    conn.execute(f"PRAGMA cache_size={settings.DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size={settings.DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to ``size`` and reused, so each keeps its
+    page cache and prepared-statement cache across requests.
+    """
+
+    def __init__(self, size: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error"""
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return get_db_connection()
+                except BaseException:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError("Timed out waiting for a database connection")
+
+
+pool = ConnectionPool(settings.DB_POOL_SIZE, settings.DB_POOL_TIMEOUT)
+
+# One thread per pooled connection, so queued DB work never waits on the pool
+_executor = ThreadPoolExecutor(max_workers=settings.DB_POOL_SIZE, thread_name_prefix="db")
+
+
+def db_connection():
+    """Borrow a pooled connection (blocking; use from sync code or run_db)"""
+    return pool.connection()
+
+
+async def run_db(func: Callable[..., T], *args) -> T:
+    """Run blocking database work on the DB thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args))
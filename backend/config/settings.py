@@ -12,17 +12,119 @@ class Settings:
 
     # Database
     DATABASE_URL = "nutrition_app.db"
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_POOL_TIMEOUT = 10  # seconds to wait for a free connection
+    DB_BUSY_TIMEOUT = 5000  # milliseconds
+    DB_CACHE_SIZE = -16000  # negative = KiB per connection
+    DB_MMAP_SIZE = 64 * 1024 * 1024
+    DB_STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
 
     # Rate Limiting
     DAILY_LIMIT = 3
 
+    # Admin
+    ADMIN_STATS_TTL = 10  # seconds /admin/stats responses are reused
+
+    # Per-user response cache (services.response_cache); entries are also
+    # dropped whenever the user's usage or analyses change in this process
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES = 10_000
+
+    # Response compression (skipped for small bodies and compressed formats)
+    GZIP_MINIMUM_SIZE = 1000  # bytes
+    GZIP_LEVEL = 6
+
     # Authentication
     CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
     ADMIN_USER_ID = os.getenv("ADMIN_USER_ID", "admin_user_id_here")
+    CLERK_API_URL = "https://api.clerk.dev/v1"
+    CLERK_TIMEOUT = float(os.getenv("CLERK_TIMEOUT", "5"))  # seconds
+    CLERK_MAX_CONNECTIONS = 20
+
+    # Local JWT verification (enabled when CLERK_JWKS_URL is set; accepts
+    # https:// URLs or file:// paths). CLERK_ISSUER is then required, e.g.
+    # https://<your-app>.clerk.accounts.dev
+    CLERK_JWKS_URL = os.getenv("CLERK_JWKS_URL")
+    CLERK_ISSUER = os.getenv("CLERK_ISSUER")
+    JWKS_MIN_REFRESH_INTERVAL = 60  # seconds between refetches for unknown kids
+    JWT_LEEWAY = 5  # seconds of allowed clock skew
+    VERIFIED_TOKEN_CACHE_SIZE = 10_000
+
+    # Clerk user lookup cache
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))  # seconds
+    USER_CACHE_NEGATIVE_TTL = int(os.getenv("USER_CACHE_NEGATIVE_TTL", "30"))
+    USER_CACHE_STALE_TTL = int(os.getenv("USER_CACHE_STALE_TTL", "3600"))  # serve stale while refreshing
+    USER_CACHE_MAX_ENTRIES = 10_000
 
     # AI Service
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL = "gemini-2.0-flash"
+    PROMPT_VERSION = "2"  # Bump whenever the analysis prompt changes
+
+    # Batch analysis
+    MAX_BATCH_SIZE = 20
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # concurrent LLM calls per batch
+
+    # LLM call resilience (services.resilience)
+    LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "60"))  # seconds per attempt
+    LLM_TOTAL_TIMEOUT = float(os.getenv("LLM_TOTAL_TIMEOUT", "120"))  # seconds for all attempts
+    LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # seconds, doubled per retry
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # consecutive failures
+    LLM_BREAKER_RESET_TIMEOUT = float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "30"))  # seconds open
+    LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"  # may double LLM cost
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))  # seconds
+
+    # Analysis cache (keyed by image content + model + prompt version)
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "512"))
+    ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", "16000000"))  # 16MB
+    ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))  # seconds
+    ANALYSIS_CACHE_DISK_TTL = int(os.getenv("ANALYSIS_CACHE_DISK_TTL", "604800"))  # 7 days
+
+    # Analysis job queue (POST /jobs/analyze-image)
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # concurrent jobs per process
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))  # running jobs older than this are retried
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))  # seconds
+    JOB_MAX_WAIT = 30  # longest long-poll on GET /jobs/{job_id}, in seconds
+    JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+    # PDF reports
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))  # renderer processes
+    PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdf_cache")
+    PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", "200000000"))  # 200MB
+    PDF_PRERENDER = os.getenv("PDF_PRERENDER", "false").lower() == "true"
+
+    # Startup: load the LLM client, Pillow and a PDF renderer in the background
+    # once the server is accepting requests (see /ready)
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+    # Thumbnails kept for each analysis (content-addressed blob store)
+    THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", "blobs/thumbnails")
+    THUMBNAIL_STORE_MAX_BYTES = int(os.getenv("THUMBNAIL_STORE_MAX_BYTES", "500000000"))  # 500MB
+    THUMBNAIL_MAX_EDGE = int(os.getenv("THUMBNAIL_MAX_EDGE", "640"))  # pixels
+    THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+    # Stored analysis text (utils.compression) and archival (services.compaction).
+    # Existing databases need a one-time `python -m services.compaction --convert`
+    # before compaction can release free pages
+    ANALYSIS_COMPRESSION = os.getenv("ANALYSIS_COMPRESSION", "true").lower() == "true"
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))  # analyses older than this are archived
+    COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL", "86400"))  # seconds; 0 disables
+    COMPACTION_BATCH_SIZE = 500  # analyses moved per transaction
+    COMPACTION_VACUUM_PAGES = 1000  # free pages released per incremental vacuum step
+
+    # Data export (GET /user/export, GET /admin/export/{table})
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))  # rows per query
+    EXPORT_GZIP_LEVEL = 6
+
+    # On-demand profiling (POST /admin/profile/start, /admin/memory/*)
+    PROFILE_INTERVAL_MS = 5  # default sampling interval
+    PROFILE_MAX_SECONDS = 300  # longest profiling session
+    TRACEMALLOC_FRAMES = 25  # frames kept per traced allocation
+    MEMORY_MAX_SNAPSHOTS = 5  # named tracemalloc snapshots kept in memory
 
     # CORS
     ALLOWED_ORIGINS = [
@@ -34,7 +136,16 @@ class Settings:
 
     # File Upload
     MAX_FILE_SIZE = 10_000_000  # 10MB
+    MAX_REQUEST_SIZE = MAX_FILE_SIZE + 1_000_000  # whole request body, incl. form fields
+    UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes read per chunk from an upload
+    IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "40000000"))  # decompression-bomb guard
     ALLOWED_FILE_TYPES = ["image/jpeg", "image/png", "image/jpg"]
 
+    # Image normalization (applied before the image is sent to the LLM)
+    IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1536"))  # pixels
+    IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")  # JPEG or WEBP
+    IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+    IMAGE_LOW_DETAIL_MAX_EDGE = 512  # images this small are sent with detail "low"
+
 
 settings = Settings()
@@ -1,18 +1,53 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware
 from config.settings import settings
-from config.database import init_db
-from routes import health, user, analysis, admin
+from config.database import init_db, pool
+from routes import health, user, analysis, admin, jobs, metrics
+from services.clerk_client import clerk_users
+from services.compaction import compaction_loop
+from services.job_queue import job_queue
+from services.metrics import MetricsMiddleware
+from services.pdf_service import shutdown_renderers
+from services.profiling import ProfilingMiddleware
+from services.warmup import mark_warm, warm_up
+from utils.body_limit import BodySizeLimitMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize database
+    init_db()
+    mark_warm("database")
+
+    # Analysis job workers (jobs left over from a previous run are resumed)
+    job_queue.start()
+
+    # Heavy clients load in the background so health checks pass right away
+    warmup_task = asyncio.create_task(warm_up()) if settings.WARMUP_ON_STARTUP else None
+
+    # Periodic archival of old analyses (services.compaction)
+    compaction_task = asyncio.create_task(compaction_loop()) if settings.COMPACTION_INTERVAL > 0 else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if compaction_task is not None:
+        compaction_task.cancel()
+    await job_queue.stop()
+    await clerk_users.close()
+    shutdown_renderers()
+    pool.close()
 
-# Initialize database
-init_db()
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     description=settings.APP_DESCRIPTION,
     version=settings.APP_VERSION,
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -32,6 +67,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cap request bodies while they stream in (batch uploads may carry several files)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.MAX_REQUEST_SIZE,
+    path_limits={
+        "/analyze-images": settings.MAX_FILE_SIZE * settings.MAX_BATCH_SIZE + 1_000_000,
+    },
+)
+
+# Compress JSON/CSV responses (PDFs are already compressed, SSE must not be buffered)
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_LEVEL,
+    exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/pdf",),
+)
+
+# Request count and latency metrics
+app.add_middleware(MetricsMiddleware)
+
+# Registers requests with an active profiling session (see /admin/profile)
+app.add_middleware(ProfilingMiddleware)
+
 # Preflight handler for OPTIONS requests
 @app.options("/{full_path:path}")
 async def options_handler():
@@ -42,6 +100,8 @@ app.include_router(health.router)
 app.include_router(user.router)
 app.include_router(analysis.router)
 app.include_router(admin.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
 
 
 # Root endpoint
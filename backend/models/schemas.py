@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List, Union
+from pydantic import BaseModel, Field
+from typing import Dict, Optional, List, Union
 
 class UserInfo(BaseModel):
     user_id: str
@@ -16,18 +16,82 @@ class UserProfile(BaseModel):
     today_analyses: int
     member_since: str
 
+class NutritionFacts(BaseModel):
+    calories: Optional[float] = Field(None, ge=0)
+    carbs_g: Optional[float] = Field(None, ge=0)
+    protein_g: Optional[float] = Field(None, ge=0)
+    fat_g: Optional[float] = Field(None, ge=0)
+    fiber_g: Optional[float] = Field(None, ge=0)
+    sugar_g: Optional[float] = Field(None, ge=0)
+    quality_score: Optional[float] = Field(None, ge=0, le=10)
+
 class AnalysisHistory(BaseModel):
     id: str
     preview: str
     created_at: str
+    thumbnail_url: Optional[str] = None
+
+class AnalysisHistoryPage(BaseModel):
+    items: List[AnalysisHistory]
+    next_cursor: Optional[str] = None
+
+class AnalysisSearchPage(BaseModel):
+    items: List[AnalysisHistory]
+    next_offset: Optional[int] = None
 
 class AnalysisResponse(BaseModel):
     analysis: str
     remaining_requests: Union[str, int]
     analysis_id: str
+    nutrition: Optional[NutritionFacts] = None
     is_admin: bool
     timestamp: str
 
+class BatchAnalysisItem(BaseModel):
+    filename: Optional[str] = None
+    analysis_id: Optional[str] = None
+    analysis: Optional[str] = None
+    nutrition: Optional[NutritionFacts] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchAnalysisItem]
+    remaining_requests: Union[str, int]
+    is_admin: bool
+    timestamp: str
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    remaining_requests: Union[str, int]
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, succeeded or failed
+    attempts: int
+    analysis_id: Optional[str] = None
+    analysis: Optional[str] = None
+    nutrition: Optional[NutritionFacts] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+class NutritionTotals(BaseModel):
+    period_start: str
+    analyses: int
+    calories: float
+    carbs_g: float
+    protein_g: float
+    fat_g: float
+    fiber_g: float
+    sugar_g: float
+    avg_quality_score: Optional[float] = None
+
+class NutritionSummary(BaseModel):
+    period: str
+    totals: List[NutritionTotals]
+
 class AdminStats(BaseModel):
     total_users: int
     total_analyses: int
@@ -39,6 +103,10 @@ class HealthResponse(BaseModel):
     service: str
     timestamp: str
 
+class ReadinessResponse(BaseModel):
+    status: str
+    components: Dict[str, bool]
+
 class RootResponse(BaseModel):
     message: str
     status: str
@@ -1,42 +1,52 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import time
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import PlainTextResponse
 from models.schemas import UserInfo, AdminStats
 from services.auth import verify_clerk_token
-from config.database import get_db_connection
+from config.database import db_connection, run_db
 from config.settings import settings
+from services.analysis_cache import analysis_cache
+from services.clerk_client import clerk_users
+from services.pdf_cache import pdf_cache
+from services.blob_store import thumbnail_store
+from services.export import analyses_source, export_response, usage_source
+from services.response_cache import CachedResponse, conditional_response, make_entry, response_cache
+from services.profiling import memory_tracker, profiler
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-@router.get("/stats", response_model=AdminStats)
-async def get_admin_stats(user: UserInfo = Depends(verify_clerk_token)):
-    """Admin-only route to get usage statistics"""
-    if user.user_id != settings.ADMIN_USER_ID:
-        raise HTTPException(status_code=403, detail="Admin access required")
+# Short-lived cache of the serialized stats response
+_stats_cache: Optional[CachedResponse] = None
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    # Get total users
-    cursor.execute("SELECT COUNT(*) FROM user_usage")
-    total_users = cursor.fetchone()[0]
+def _fetch_stats() -> AdminStats:
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    # Get total analyses
-    cursor.execute("SELECT COUNT(*) FROM analyses")
-    total_analyses = cursor.fetchone()[0]
+        # Get total users (trigger-maintained counter)
+        cursor.execute("SELECT value FROM stats_totals WHERE name = 'users'")
+        row = cursor.fetchone()
+        total_users = row[0] if row else 0
 
-    # Get today's analyses
-    cursor.execute("SELECT COUNT(*) FROM analyses WHERE DATE(created_at) = DATE('now')")
-    today_analyses = cursor.fetchone()[0]
+        # Get total analyses (one row per day)
+        cursor.execute("SELECT COALESCE(SUM(analyses), 0) FROM daily_stats")
+        total_analyses = cursor.fetchone()[0]
 
-    # Get top users
-    cursor.execute("""
-        SELECT email, total_requests 
-        FROM user_usage 
-        ORDER BY total_requests DESC 
-        LIMIT 5
-    """)
-    top_users = cursor.fetchall()
+        # Get today's analyses
+        cursor.execute("SELECT analyses FROM daily_stats WHERE day = DATE('now')")
+        row = cursor.fetchone()
+        today_analyses = row[0] if row else 0
 
-    conn.close()
+        # Get top users
+        cursor.execute("""
+            SELECT email, total_requests 
+            FROM user_usage 
+            ORDER BY total_requests DESC 
+            LIMIT 5
+        """)
+        top_users = cursor.fetchall()
 
     return AdminStats(
         total_users=total_users,
@@ -44,3 +54,174 @@ async def get_admin_stats(user: UserInfo = Depends(verify_clerk_token)):
         today_analyses=today_analyses,
         top_users=[{"email": user[0], "requests": user[1]} for user in top_users],
     )
+
+
+@router.get("/stats", response_model=AdminStats)
+async def get_admin_stats(request: Request, user: UserInfo = Depends(verify_clerk_token)):
+    """Admin-only route to get usage statistics (supports conditional GET)"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    global _stats_cache
+    if _stats_cache is None or _stats_cache.expires_at <= time.time():
+        stats = await run_db(_fetch_stats)
+        _stats_cache = make_entry(
+            stats.model_dump_json().encode(), settings.ADMIN_STATS_TTL, _stats_cache
+        )
+    return conditional_response(request, _stats_cache)
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(user: UserInfo = Depends(verify_clerk_token)):
+    """Admin-only route to get cache hit/miss counters"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return {
+        "analysis": analysis_cache.stats(),
+        "clerk_users": clerk_users.stats(),
+        "pdf": pdf_cache.stats(),
+        "thumbnails": thumbnail_store.stats(),
+        "responses": response_cache.stats(),
+    }
+
+
+@router.get("/export/{table}")
+async def export_table(
+    table: Literal["analyses", "user_usage"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Admin-only route to download a whole table as NDJSON or CSV (streamed)"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    source = analyses_source() if table == "analyses" else usage_source()
+    return export_response(source, table, format, gzip)
+
+
+MemoryGroup = Literal["upload", "base64", "pdf"]  # see MEMORY_GROUPS
+
+
+@router.post("/profile/start")
+async def start_profile(
+    requests: Optional[int] = Query(None, ge=1, le=10_000),
+    seconds: float = Query(30, gt=0, le=settings.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(settings.PROFILE_INTERVAL_MS, ge=1, le=1000),
+    idle: bool = False,
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Admin-only route to sample-profile (wall-clock) the next ``requests``
+    requests, or every request for ``seconds`` (the session ends at whichever
+    comes first). Download the stacks from /admin/profile/collapsed.
+    ``idle`` keeps samples of threads blocked waiting for work."""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        return profiler.start(requests, seconds, interval_ms, idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/profile/stop")
+async def stop_profile(user: UserInfo = Depends(verify_clerk_token)):
+    """Admin-only route to end the running profiling session early"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return await asyncio.to_thread(profiler.stop)
+
+
+@router.get("/profile")
+async def get_profile_status(user: UserInfo = Depends(verify_clerk_token)):
+    """Admin-only route to get the state of the current or last profiling session"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return profiler.status()
+
+
+@router.get("/profile/collapsed", response_class=PlainTextResponse)
+async def get_profile_collapsed(wait: bool = False, user: UserInfo = Depends(verify_clerk_token)):
+    """Admin-only route to download samples as collapsed stacks (flamegraph.pl,
+    speedscope). With ``wait`` the response is sent once the session ends."""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    if profiler.status()["state"] == "idle":
+        raise HTTPException(status_code=404, detail="No profiling session has run")
+    while wait and profiler.running:
+        await asyncio.sleep(0.2)
+    return PlainTextResponse(profiler.collapsed())
+
+
+@router.post("/memory/start")
+async def start_memory_tracing(
+    frames: int = Query(settings.TRACEMALLOC_FRAMES, ge=1, le=100),
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Admin-only route to start tracing allocations (tracemalloc)"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return memory_tracker.start(frames)
+
+
+@router.post("/memory/stop")
+async def stop_memory_tracing(user: UserInfo = Depends(verify_clerk_token)):
+    """Admin-only route to stop tracing allocations and drop all snapshots"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return memory_tracker.stop()
+
+
+@router.get("/memory")
+async def get_memory_status(user: UserInfo = Depends(verify_clerk_token)):
+    """Admin-only route to get traced memory, snapshots and PDF worker reports"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return memory_tracker.status()
+
+
+@router.post("/memory/snapshot")
+async def take_memory_snapshot(
+    label: str = Query(..., min_length=1, max_length=64),
+    group: Optional[MemoryGroup] = None,
+    limit: int = Query(20, ge=1, le=200),
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Admin-only route to take a named snapshot and list its largest
+    allocation sites, optionally only those on the upload, base64 or PDF path"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        return await asyncio.to_thread(memory_tracker.snapshot, label, group, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/memory/diff")
+async def diff_memory_snapshots(
+    base: str,
+    target: Optional[str] = None,
+    group: Optional[MemoryGroup] = None,
+    key_type: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(20, ge=1, le=200),
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Admin-only route to compare snapshot ``base`` with ``target`` (or the
+    current heap), largest growth first"""
+    if user.user_id != settings.ADMIN_USER_ID:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        return await asyncio.to_thread(memory_tracker.diff, base, target, group, key_type, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot: {e.args[0]}")
@@ -1,49 +1,136 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Response, Form
-from datetime import datetime
-from models.schemas import UserInfo, AnalysisResponse
+import asyncio
+import json
+from io import BytesIO
+from typing import List, Optional
+import anyio
+from fastapi import APIRouter, BackgroundTasks, File, UploadFile, HTTPException, Depends, Response, Form, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from datetime import datetime, timedelta, timezone
+from models.schemas import (
+    UserInfo,
+    AnalysisResponse,
+    BatchAnalysisItem,
+    BatchAnalysisResponse,
+    NutritionFacts,
+)
 from services.auth import verify_clerk_token
-from services.rate_limiter import check_rate_limit
-from services.ai_service import analyze_food_image
-from services.pdf_service import pdf_generator
-from utils.helpers import encode_image, validate_file_type, validate_file_size
+from services.rate_limiter import check_rate_limit, reserve_requests, refund_requests
+from services.ai_service import (
+    NUTRITION_BLOCK_MARKER,
+    SECTION_MARKERS,
+    analyze_food_image,
+    get_analysis,
+    load_analysis,
+    save_analysis,
+    save_analyses,
+    split_report,
+    stream_analysis,
+)
+from services.pdf_service import get_report_pdf, render_pdf_async, render_summary_pdf_async
+from services.blob_store import save_thumbnail, thumbnail_store
+from services.metrics import UPLOAD_BYTES, stage
+from services.resilience import CircuitOpenError
+from utils.helpers import validate_file_type, validate_file_size
+from utils.image_processing import inspect_image
 from config.settings import settings
+from config.database import db_connection, run_db
 
 router = APIRouter(tags=["analysis"])
 
+async def check_upload(file: UploadFile) -> Optional[str]:
+    """Validate an upload from its size and image header, before it is read
+    into memory or charged. Returns an error message for the client, or None.
+
+    The client-supplied content type is ignored; the format is sniffed from
+    the file itself.
+    """
+    # file.size is counted by the server while spooling the upload
+    if file.size is not None and not validate_file_size(file.size):
+        return "File size too large. Maximum size is 10MB."
+    try:
+        info = await asyncio.to_thread(inspect_image, file.file)
+    except ValueError as e:
+        return str(e)
+    finally:
+        await file.seek(0)
+    if not validate_file_type(info.mime_type):
+        return "Invalid file type. Only JPEG and PNG are allowed."
+    return None
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an uploaded file in chunks, enforcing MAX_FILE_SIZE while reading"""
+    buffer = BytesIO()
+    with stage("upload_read").time():
+        await file.seek(0)
+        while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+            if buffer.tell() + len(chunk) > settings.MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail="File size too large. Maximum size is 10MB."
+                )
+            buffer.write(chunk)
+    # getvalue() hands over the BytesIO buffer without another copy
+    contents = buffer.getvalue()
+    UPLOAD_BYTES.observe(len(contents))
+    return contents
+
+
+def upstream_error(e: Exception) -> Optional[HTTPException]:
+    """The client-facing error for an LLM call that failed fast or timed out"""
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="The analysis service is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": f"{e.retry_after:.0f}"},
+        )
+    if isinstance(e, TimeoutError):
+        return HTTPException(
+            status_code=504,
+            detail="The analysis took too long. Please try again.",
+        )
+    return None
+
+
+async def prerender_pdf(analysis_id: str, user: UserInfo):
+    """Render the report for a fresh analysis ahead of the first download"""
+    try:
+        analysis = await run_db(load_analysis, analysis_id, user.user_id)
+        if analysis is not None:
+            await get_report_pdf(analysis_id, analysis[0], user.email, analysis[1], analysis[2])
+    except Exception as e:
+        print(f"PDF pre-render error: {e}")
+
+
 @router.post("/analyze-image", response_model=AnalysisResponse)
 async def analyze_image(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...), 
     user: UserInfo = Depends(verify_clerk_token)
 ):
     """Analyze food image with rate limiting"""
 
+    # File validation (header only; nothing is charged for invalid uploads)
+    error = await check_upload(file)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    contents = await read_upload(file)
+
     # Rate limiting check (admin bypass)
-    allowed, remaining = check_rate_limit(user.user_id, user.email)
+    allowed, remaining = await run_db(check_rate_limit, user.user_id, user.email)
     if not allowed:
         raise HTTPException(
             status_code=429,
             detail=f"Daily limit of {settings.DAILY_LIMIT} requests exceeded. Please try again tomorrow.",
         )
 
-    # File validation
-    if not validate_file_type(file.content_type):
-        raise HTTPException(
-            status_code=400, 
-            detail="Invalid file type. Only JPEG and PNG are allowed."
-        )
-
-    if file.size and not validate_file_size(file.size):
-        raise HTTPException(
-            status_code=400, 
-            detail="File size too large. Maximum size is 10MB."
-        )
-
     try:
-        contents = await file.read()
-        image_base64 = encode_image(contents)
+        # Analyze image using AI service (cache hits still count toward the
+        # rate limit, which was charged above; failures are refunded below)
+        analysis_result, analysis_id, nutrition = await analyze_food_image(contents, user.user_id)
 
-        # Analyze image using AI service
-        analysis_result, analysis_id = await analyze_food_image(image_base64, user.user_id)
+        if settings.PDF_PRERENDER:
+            background_tasks.add_task(prerender_pdf, analysis_id, user)
 
         is_admin = user.user_id == settings.ADMIN_USER_ID
 
@@ -51,17 +138,240 @@ async def analyze_image(
             analysis=analysis_result,
             remaining_requests="Unlimited" if is_admin else remaining,
             analysis_id=analysis_id,
+            nutrition=nutrition,
             is_admin=is_admin,
             timestamp=datetime.now().isoformat(),
         )
 
-    except Exception as e:
-        print(f"Error analyzing image: {e}")
+    except ValueError as e:
+        print(f"Error decoding image: {e}")
+        await run_db(refund_requests, user.user_id)
         raise HTTPException(
+            status_code=400,
+            detail="The uploaded file could not be read as an image.",
+        )
+    except Exception as e:
+        print(f"Error analyzing image: {e!r}")
+        await run_db(refund_requests, user.user_id)
+        raise upstream_error(e) or HTTPException(
             status_code=500,
             detail="An error occurred while processing the image. Please try again.",
         )
 
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/analyze-image/stream")
+async def analyze_image_stream(
+    file: UploadFile = File(...),
+    user: UserInfo = Depends(verify_clerk_token)
+):
+    """Analyze food image and stream the report as Server-Sent Events.
+
+    Emits ``delta`` events with text chunks, a ``section`` event whenever a
+    report section heading completes, and a final ``done`` event carrying the
+    same fields as /analyze-image (or an ``error`` event). If the client
+    disconnects, the upstream LLM call is cancelled and the request refunded.
+    """
+
+    # File validation (header only; nothing is charged for invalid uploads)
+    error = await check_upload(file)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    contents = await read_upload(file)
+
+    # Rate limiting check (admin bypass)
+    allowed, remaining = await run_db(check_rate_limit, user.user_id, user.email)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Daily limit of {settings.DAILY_LIMIT} requests exceeded. Please try again tomorrow.",
+        )
+
+    is_admin = user.user_id == settings.ADMIN_USER_ID
+
+    async def events():
+        report = ""
+        sent = 0
+        line = ""
+        # Once the save has started the analysis may be written, so it is
+        # no longer refunded on cancellation
+        saving = saved = False
+        # Store the thumbnail while the report streams
+        thumbnail = asyncio.ensure_future(save_thumbnail(contents))
+        try:
+            async for chunk in stream_analysis(contents):
+                report += chunk
+
+                # Hold back the trailing nutrition JSON block, including any
+                # text that could be the start of its marker
+                marker_at = report.find(NUTRITION_BLOCK_MARKER)
+                if marker_at < 0:
+                    visible_end = len(report) - len(NUTRITION_BLOCK_MARKER) + 1
+                else:
+                    visible_end = marker_at
+                if visible_end <= sent:
+                    continue
+
+                text = report[sent:visible_end]
+                sent = visible_end
+                yield _sse("delta", {"text": text})
+
+                # Report completed section headings
+                *completed, line = (line + text).split("\n")
+                for heading in completed:
+                    if any(marker in heading for marker in SECTION_MARKERS):
+                        yield _sse("section", {"title": heading.strip()})
+
+            if NUTRITION_BLOCK_MARKER not in report and sent < len(report):
+                yield _sse("delta", {"text": report[sent:]})
+
+            analysis_result, nutrition = split_report(report)
+            thumbnail_hash = await thumbnail
+            saving = True
+            analysis_id = await run_db(
+                save_analysis, user.user_id, analysis_result, nutrition, thumbnail_hash
+            )
+            saved = True
+            yield _sse("done", {
+                "analysis": analysis_result,
+                "remaining_requests": "Unlimited" if is_admin else remaining,
+                "analysis_id": analysis_id,
+                "nutrition": nutrition.model_dump() if nutrition else None,
+                "is_admin": is_admin,
+                "timestamp": datetime.now().isoformat(),
+            })
+
+        except ValueError as e:
+            print(f"Error decoding image: {e}")
+            if not saved:
+                await run_db(refund_requests, user.user_id)
+            yield _sse("error", {"detail": "The uploaded file could not be read as an image."})
+        except Exception as e:
+            print(f"Error streaming analysis: {e!r}")
+            if not saved:
+                await run_db(refund_requests, user.user_id)
+            error = upstream_error(e)
+            yield _sse("error", {
+                "detail": error.detail if error else "An error occurred while processing the image. Please try again."
+            })
+        except BaseException:
+            # Client disconnected: the upstream call is cancelled with this
+            # task; the refund is shielded so it still runs
+            print("Analysis stream cancelled by client")
+            if not saving:
+                with anyio.CancelScope(shield=True):
+                    await run_db(refund_requests, user.user_id)
+            raise
+        finally:
+            if not thumbnail.done():
+                thumbnail.cancel()
+            elif not thumbnail.cancelled():
+                thumbnail.exception()  # mark retrieved; save_thumbnail logs its own errors
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/analyze-images", response_model=BatchAnalysisResponse)
+async def analyze_images(
+    files: List[UploadFile] = File(...),
+    user: UserInfo = Depends(verify_clerk_token)
+):
+    """Analyze several food images in one request.
+
+    Quota for all valid files is reserved up front, the LLM calls run
+    concurrently (at most BATCH_CONCURRENCY at a time) and all successful
+    analyses are saved in one transaction. Failed items are refunded.
+    """
+    if len(files) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Maximum batch size is {settings.MAX_BATCH_SIZE}.",
+        )
+
+    # File validation (invalid files are reported per item and not charged)
+    results = [BatchAnalysisItem(filename=file.filename) for file in files]
+    valid = []
+    errors = await asyncio.gather(*(check_upload(file) for file in files))
+    for index, error in enumerate(errors):
+        if error:
+            results[index].error = error
+        else:
+            valid.append(index)
+
+    # Rate limiting check for the whole batch (admin bypass)
+    allowed, remaining = await run_db(reserve_requests, user.user_id, user.email, len(valid))
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Daily limit of {settings.DAILY_LIMIT} requests does not allow {len(valid)} more analyses today.",
+        )
+
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def analyze_one(file: UploadFile) -> tuple[tuple[str, Optional[NutritionFacts]], Optional[str]]:
+        async with semaphore:
+            contents = await read_upload(file)
+            analysis = await get_analysis(contents)
+            # Only successful items get a thumbnail; failed ones leave no blob behind
+            return analysis, await save_thumbnail(contents)
+
+    outcomes = await asyncio.gather(
+        *(analyze_one(files[index]) for index in valid), return_exceptions=True
+    )
+
+    succeeded = []
+    thumbnails = {}
+    for index, outcome in zip(valid, outcomes):
+        if isinstance(outcome, ValueError):
+            print(f"Error decoding image {files[index].filename}: {outcome}")
+            results[index].error = "The uploaded file could not be read as an image."
+        elif isinstance(outcome, Exception):
+            print(f"Error analyzing image {files[index].filename}: {outcome!r}")
+            error = upstream_error(outcome)
+            results[index].error = (
+                error.detail if error else "An error occurred while processing the image. Please try again."
+            )
+        else:
+            (results[index].analysis, results[index].nutrition), thumbnails[index] = outcome
+            succeeded.append(index)
+
+    try:
+        analysis_ids = await run_db(
+            save_analyses,
+            user.user_id,
+            [(results[index].analysis, results[index].nutrition) for index in succeeded],
+            [thumbnails[index] for index in succeeded],
+        )
+    except Exception as e:
+        print(f"Error saving batch analyses: {e}")
+        await run_db(refund_requests, user.user_id, len(valid))
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while saving the analyses. Please try again.",
+        )
+    for index, analysis_id in zip(succeeded, analysis_ids):
+        results[index].analysis_id = analysis_id
+
+    failed = len(valid) - len(succeeded)
+    if failed:
+        await run_db(refund_requests, user.user_id, failed)
+        remaining += failed
+
+    is_admin = user.user_id == settings.ADMIN_USER_ID
+
+    return BatchAnalysisResponse(
+        results=results,
+        remaining_requests="Unlimited" if is_admin else remaining,
+        is_admin=is_admin,
+        timestamp=datetime.now().isoformat(),
+    )
+
 @router.post("/generate-pdf")
 async def generate_pdf(
     file: UploadFile = File(...),
@@ -69,14 +379,16 @@ async def generate_pdf(
     user: UserInfo = Depends(verify_clerk_token)
 ):
     """Generate PDF with image and analysis"""
+    error = await check_upload(file)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
     try:
-        # Read and encode image
-        contents = await file.read()
-        image_base64 = encode_image(contents)
-        
-        # Generate PDF using the correct method name
-        pdf_bytes = pdf_generator.create_pdf(
-            image_base64=image_base64,
+        contents = await read_upload(file)
+
+        # Generate PDF in the renderer processes (raw bytes, no base64 round trip)
+        pdf_bytes = await render_pdf_async(
+            image_data=contents,
             analysis_text=analysis_text,
             user_email=user.email
         )
@@ -92,4 +404,79 @@ async def generate_pdf(
         
     except Exception as e:
         print(f"PDF generation error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate PDF")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to generate PDF")
+
+@router.get("/analyses/{analysis_id}/pdf")
+async def get_analysis_pdf(
+    analysis_id: str,
+    user: UserInfo = Depends(verify_clerk_token)
+):
+    """Download the PDF report for a stored analysis (no re-upload needed)"""
+    analysis = await run_db(load_analysis, analysis_id, user.user_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+
+    try:
+        analysis_text, created_at, thumbnail_hash = analysis
+        pdf_bytes = await get_report_pdf(
+            analysis_id, analysis_text, user.email, created_at, thumbnail_hash
+        )
+    except Exception as e:
+        print(f"PDF generation error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate PDF")
+
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=nutrition_analysis_{analysis_id}.pdf"}
+    )
+
+@router.get("/reports/summary")
+async def get_summary_report(
+    days: int = Query(7, ge=1, le=31),
+    user: UserInfo = Depends(verify_clerk_token)
+):
+    """Download a PDF summarising every analysis of the last ``days`` days"""
+    # Analyses are timestamped in UTC
+    end = datetime.now(timezone.utc).date()
+    start = end - timedelta(days=days - 1)
+
+    try:
+        pdf_bytes = await render_summary_pdf_async(user.user_id, user.email, start, end)
+    except Exception as e:
+        print(f"Summary PDF generation error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate PDF")
+
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=nutrition_summary_{start:%Y%m%d}_{end:%Y%m%d}.pdf"}
+    )
+
+def _load_thumbnail_hash(analysis_id: str, user_id: str) -> Optional[str]:
+    with db_connection() as conn:
+        row = conn.execute(
+            "SELECT thumbnail_hash FROM all_analyses WHERE id = ? AND user_id = ?",
+            (analysis_id, user_id),
+        ).fetchone()
+    return row[0] if row else None
+
+
+@router.get("/analyses/{analysis_id}/thumbnail")
+async def get_analysis_thumbnail(
+    analysis_id: str,
+    user: UserInfo = Depends(verify_clerk_token)
+):
+    """Thumbnail of the image of a stored analysis (JPEG)"""
+    thumbnail_hash = await run_db(_load_thumbnail_hash, analysis_id, user.user_id)
+    path = await asyncio.to_thread(thumbnail_store.find, thumbnail_hash) if thumbnail_hash else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    # Served straight from disk (zero-copy where the server supports it);
+    # content-addressed, so the bytes behind this URL never change
+    return FileResponse(
+        path,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
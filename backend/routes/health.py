@@ -1,7 +1,9 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from datetime import datetime
-from models.schemas import HealthResponse, RootResponse
+from models.schemas import HealthResponse, ReadinessResponse, RootResponse
 from config.settings import settings
+from services import warmup
 
 router = APIRouter()
 
@@ -21,3 +23,13 @@ async def health_check():
         service="ai-nutrition-analyzer",
         timestamp=datetime.now().isoformat(),
     )
+
+@router.get("/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    """Report which components are warm; 503 until all of them are"""
+    ready = warmup.is_ready()
+    body = ReadinessResponse(
+        status="ready" if ready else "warming",
+        components=dict(warmup.components),
+    )
+    return JSONResponse(status_code=200 if ready else 503, content=body.model_dump())
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from models.schemas import JobStatusResponse, JobSubmitResponse, UserInfo
+from routes.analysis import check_upload, read_upload
+from services.auth import verify_clerk_token
+from services.job_queue import job_queue
+from services.rate_limiter import check_rate_limit, refund_requests
+from config.settings import settings
+from config.database import run_db
+
+router = APIRouter(tags=["jobs"])
+
+@router.post("/jobs/analyze-image", response_model=JobSubmitResponse, status_code=202)
+async def submit_analysis_job(
+    file: UploadFile = File(...),
+    user: UserInfo = Depends(verify_clerk_token)
+):
+    """Queue a food image for analysis and return a job ID right away.
+
+    The request is charged at submission and refunded if the job fails. Poll
+    GET /jobs/{job_id} (optionally with ``wait``) for the result.
+    """
+    error = await check_upload(file)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    contents = await read_upload(file)
+
+    # Rate limiting check (admin bypass)
+    allowed, remaining = await run_db(check_rate_limit, user.user_id, user.email)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Daily limit of {settings.DAILY_LIMIT} requests exceeded. Please try again tomorrow.",
+        )
+
+    try:
+        job_id = await job_queue.submit(user.user_id, contents)
+    except Exception as e:
+        print(f"Error queueing analysis job: {e}")
+        await run_db(refund_requests, user.user_id)
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while queueing the image. Please try again.",
+        )
+
+    is_admin = user.user_id == settings.ADMIN_USER_ID
+    return JobSubmitResponse(
+        job_id=job_id,
+        status="queued",
+        status_url=f"/jobs/{job_id}",
+        remaining_requests="Unlimited" if is_admin else remaining,
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_analysis_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=settings.JOB_MAX_WAIT, description="Seconds to wait for the job to finish"),
+    user: UserInfo = Depends(verify_clerk_token)
+):
+    """Job status, including the analysis once it has succeeded"""
+    job = await job_queue.wait(job_id, user.user_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
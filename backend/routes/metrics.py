@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint (counters are per worker process)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
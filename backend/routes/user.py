@@ -1,58 +1,279 @@
-from fastapi import APIRouter, Depends
+import base64
+import binascii
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from datetime import datetime
-from models.schemas import UserInfo, UserProfile
+from models.schemas import (
+    UserInfo,
+    UserProfile,
+    AnalysisHistory,
+    AnalysisHistoryPage,
+    AnalysisSearchPage,
+    NutritionSummary,
+    NutritionTotals,
+)
 from services.auth import verify_clerk_token
-from config.database import get_db_connection
+from config.database import db_connection, run_db
 from config.settings import settings
+from services.export import analyses_source, export_response, usage_source
+from services.search import search_analyses
+from services.response_cache import conditional_response, response_cache
 
 router = APIRouter(prefix="/user", tags=["user"])
 
+
+def _fetch_usage(user_id: str) -> tuple[int, int, str, int]:
+    """Load usage counters and today's analyses count for a user"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT daily_requests, last_request_date, total_requests, created_at FROM user_usage WHERE user_id = ?",
+            (user_id,),
+        )
+        result = cursor.fetchone()
+
+        if result:
+            daily_requests, last_request_date, total_requests, created_at = result
+            today = datetime.now().date()
+            if last_request_date != str(today):
+                daily_requests = 0
+        else:
+            daily_requests = 0
+            total_requests = 0
+            created_at = datetime.now().isoformat()
+
+        # Get recent analyses count (range predicate so the index is used)
+        cursor.execute(
+            "SELECT COUNT(*) FROM analyses WHERE user_id = ? AND created_at >= DATE('now') AND created_at < DATE('now', '+1 day')",
+            (user_id,),
+        )
+        today_analyses = cursor.fetchone()[0]
+
+    return daily_requests, total_requests, created_at, today_analyses
+
+
 @router.get("/profile", response_model=UserProfile)
-async def get_user_profile(user: UserInfo = Depends(verify_clerk_token)):
-    """Get user profile and usage statistics"""
-    print(f"DEBUG: Getting profile for user: {user.user_id}")
-    print(f"DEBUG: Admin user ID: {settings.ADMIN_USER_ID}")
-    print(f"DEBUG: Is admin: {user.user_id == settings.ADMIN_USER_ID}")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT daily_requests, last_request_date, total_requests, created_at FROM user_usage WHERE user_id = ?",
-        (user.user_id,),
+async def get_user_profile(request: Request, user: UserInfo = Depends(verify_clerk_token)):
+    """Get user profile and usage statistics.
+
+    Served from the per-user response cache while the user's usage is
+    unchanged, with ETag/Last-Modified validators for conditional polls.
+    """
+    # Usage counters reset at midnight
+    cache_key = f"profile:{datetime.now().date()}:{user.email}"
+    entry = response_cache.get(user.user_id, cache_key)
+    if entry is None:
+        token = response_cache.token()
+        print(f"DEBUG: Getting profile for user: {user.user_id}")
+        print(f"DEBUG: Admin user ID: {settings.ADMIN_USER_ID}")
+        print(f"DEBUG: Is admin: {user.user_id == settings.ADMIN_USER_ID}")
+
+        daily_requests, total_requests, created_at, today_analyses = await run_db(
+            _fetch_usage, user.user_id
+        )
+
+        is_admin = user.user_id == settings.ADMIN_USER_ID
+        print(f"DEBUG: Final is_admin value: {is_admin}")
+
+        profile = UserProfile(
+            user_id=user.user_id,
+            email=user.email,
+            is_admin=is_admin,
+            daily_requests_used=daily_requests,
+            daily_limit="Unlimited" if is_admin else settings.DAILY_LIMIT,
+            remaining_requests="Unlimited" if is_admin else settings.DAILY_LIMIT - daily_requests,
+            total_requests=total_requests,
+            today_analyses=today_analyses,
+            member_since=created_at,
+        )
+        entry = response_cache.put(
+            user.user_id, cache_key, profile.model_dump_json().encode(), token
+        )
+
+    return conditional_response(request, entry)
+
+
+def _encode_cursor(created_at: str, analysis_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{analysis_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        created_at, analysis_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, analysis_id
+
+
+def _fetch_history(user_id: str, limit: int, after: Optional[tuple[str, str]]) -> list:
+    """Fetch one page of history, newest first, seeking past the cursor.
+
+    The (created_at, id) row-value comparison is served by the
+    (user_id, created_at, id) index, so deep pages cost the same as the first.
+    Live and archived analyses are read separately (a descending scan of the
+    all_analyses view would sort every matching row) and merged.
+    """
+    rows = []
+    with db_connection() as conn:
+        for table in ("analyses", "analyses_archive"):
+            if after is None:
+                rows += conn.execute(
+                    f"""
+                    SELECT id, preview, created_at, thumbnail_hash FROM {table}
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                    """,
+                    (user_id, limit),
+                ).fetchall()
+            else:
+                rows += conn.execute(
+                    f"""
+                    SELECT id, preview, created_at, thumbnail_hash FROM {table}
+                    WHERE user_id = ? AND (created_at, id) < (?, ?)
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                    """,
+                    (user_id, after[0], after[1], limit),
+                ).fetchall()
+            if len(rows) >= limit:
+                # Archived analyses are all older than live ones
+                break
+    rows.sort(key=lambda row: (row[2], row[0]), reverse=True)
+    return rows[:limit]
+
+
+@router.get("/history", response_model=AnalysisHistoryPage)
+async def get_analysis_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Get the user's past analyses, newest first, one page at a time.
+
+    Pass the returned ``next_cursor`` to fetch the following page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    rows = await run_db(_fetch_history, user.user_id, limit + 1, after)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][2], rows[-1][0])
+
+    return AnalysisHistoryPage(
+        items=[
+            AnalysisHistory(
+                id=analysis_id,
+                preview=preview or "",
+                created_at=created_at,
+                thumbnail_url=f"/analyses/{analysis_id}/thumbnail" if thumbnail_hash else None,
+            )
+            for analysis_id, preview, created_at, thumbnail_hash in rows
+        ],
+        next_cursor=next_cursor,
     )
-    result = cursor.fetchone()
 
-    if result:
-        daily_requests, last_request_date, total_requests, created_at = result
-        today = datetime.now().date()
-        if last_request_date != str(today):
-            daily_requests = 0
-    else:
-        daily_requests = 0
-        total_requests = 0
-        created_at = datetime.now().isoformat()
-
-    # Get recent analyses count
-    cursor.execute(
-        "SELECT COUNT(*) FROM analyses WHERE user_id = ? AND DATE(created_at) = DATE('now')",
-        (user.user_id,),
+
+def _search_history(user_id: str, query: str, limit: int, offset: int) -> list:
+    with db_connection() as conn:
+        return search_analyses(conn, user_id, query, limit, offset)
+
+
+@router.get("/search", response_model=AnalysisSearchPage)
+async def search_analysis_history(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Search the user's analyses by text, best matches first.
+
+    Every word must appear (``salm*`` matches by prefix). Pass the returned
+    ``next_offset`` to fetch the following page.
+    """
+    rows = await run_db(_search_history, user.user_id, q, limit + 1, offset)
+
+    next_offset = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_offset = offset + limit
+
+    return AnalysisSearchPage(
+        items=[
+            AnalysisHistory(
+                id=analysis_id,
+                preview=preview or "",
+                created_at=created_at,
+                thumbnail_url=f"/analyses/{analysis_id}/thumbnail" if thumbnail_hash else None,
+            )
+            for analysis_id, preview, created_at, thumbnail_hash in rows
+        ],
+        next_offset=next_offset,
     )
-    today_analyses = cursor.fetchone()[0]
-
-    conn.close()
-
-    is_admin = user.user_id == settings.ADMIN_USER_ID
-    print(f"DEBUG: Final is_admin value: {is_admin}")
-
-    return UserProfile(
-        user_id=user.user_id,
-        email=user.email,
-        is_admin=is_admin,
-        daily_requests_used=daily_requests,
-        daily_limit="Unlimited" if is_admin else settings.DAILY_LIMIT,
-        remaining_requests="Unlimited" if is_admin else settings.DAILY_LIMIT - daily_requests,
-        total_requests=total_requests,
-        today_analyses=today_analyses,
-        member_since=created_at,
-    )
\ No newline at end of file
+
+
+# SQL expressions mapping a rollup day to the start of its period (weeks start on Monday)
+PERIOD_START = {
+    "daily": "day",
+    "weekly": "DATE(day, '-6 days', 'weekday 1')",
+}
+
+
+def _fetch_nutrition_totals(user_id: str, period: str, days: int) -> list:
+    """Aggregate the per-day nutrition rollup into daily or weekly totals"""
+    with db_connection() as conn:
+        return conn.execute(
+            f"""
+            SELECT {PERIOD_START[period]} AS period_start,
+                   SUM(analyses), SUM(calories), SUM(carbs_g), SUM(protein_g),
+                   SUM(fat_g), SUM(fiber_g), SUM(sugar_g),
+                   SUM(quality_score_sum) / NULLIF(SUM(rated_analyses), 0)
+            FROM user_daily_nutrition
+            WHERE user_id = ? AND day >= DATE('now', ?)
+            GROUP BY period_start
+            ORDER BY period_start DESC
+            """,
+            (user_id, f"-{days - 1} days"),
+        ).fetchall()
+
+
+@router.get("/nutrition", response_model=NutritionSummary)
+async def get_nutrition_totals(
+    period: Literal["daily", "weekly"] = "daily",
+    days: int = Query(30, ge=1, le=366),
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Get the user's nutrition totals per day or week over the last ``days`` days"""
+    rows = await run_db(_fetch_nutrition_totals, user.user_id, period, days)
+
+    return NutritionSummary(
+        period=period,
+        totals=[
+            NutritionTotals(
+                period_start=row[0],
+                analyses=row[1],
+                calories=row[2],
+                carbs_g=row[3],
+                protein_g=row[4],
+                fat_g=row[5],
+                fiber_g=row[6],
+                sugar_g=row[7],
+                avg_quality_score=round(row[8], 1) if row[8] is not None else None,
+            )
+            for row in rows
+        ],
+    )
+
+
+@router.get("/export")
+async def export_user_data(
+    table: Literal["analyses", "usage"] = "analyses",
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    user: UserInfo = Depends(verify_clerk_token),
+):
+    """Download the user's analyses or usage record as NDJSON or CSV (streamed)"""
+    source = analyses_source(user.user_id) if table == "analyses" else usage_source(user.user_id)
+    return export_response(source, f"nutrition_{table}", format, gzip)
@@ -1,30 +1,69 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
 import uuid
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional
 from config.settings import settings
-from config.database import get_db_connection
+from config.database import db_connection, run_db
+from models.schemas import NutritionFacts
+from pydantic import ValidationError
+from services.analysis_cache import analysis_cache
+from services.blob_store import save_thumbnail
+from services.metrics import LLM_IMAGE_BYTES, stage
+from services.resilience import CircuitBreaker, ResilientCaller
+from services.response_cache import response_cache
+from services.search import index_analyses
+from utils.compression import compress_text, decompress_text
+from utils.helpers import encode_image, make_preview
+from utils.image_processing import PreparedImage, normalize_image
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(
-    model=settings.GEMINI_MODEL, api_key=settings.GEMINI_API_KEY
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+# LLM client, created by get_llm() on first use (benchmarks may assign a replacement)
+llm = None
+_llm_lock = threading.Lock()
+
+# Timeouts, retries, circuit breaker and hedging around every LLM call
+llm_resilience = ResilientCaller(
+    attempt_timeout=settings.LLM_ATTEMPT_TIMEOUT,
+    total_timeout=settings.LLM_TOTAL_TIMEOUT,
+    max_attempts=settings.LLM_MAX_ATTEMPTS,
+    base_delay=settings.LLM_RETRY_BASE_DELAY,
+    max_delay=settings.LLM_RETRY_MAX_DELAY,
+    breaker=CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_RESET_TIMEOUT),
+    hedge=settings.LLM_HEDGING,
+    hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+    hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY,
 )
 
 
-async def analyze_food_image(image_base64: str, user_id: str) -> tuple[str, str]:
-    """Analyze food image using AI and save to database"""
+def get_llm():
+    """Return the LLM client, importing LangChain and creating it on first use"""
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                from langchain_google_genai import ChatGoogleGenerativeAI
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "You are a professional nutrition expert and certified dietitian. Provide detailed, accurate nutritional analysis.",
-            ),
-            (
-                "human",
-                [
-                    {
-                        "type": "text",
-                        "text": """Analyze this food image and provide a comprehensive nutritional assessment:
+                # Retries and timeouts are handled by llm_resilience
+                llm = ChatGoogleGenerativeAI(
+                    model=settings.GEMINI_MODEL, api_key=settings.GEMINI_API_KEY, max_retries=0
+                )
+    return llm
+
+
+async def aget_llm():
+    """get_llm() without blocking the event loop on the first (slow) import"""
+    if llm is not None:
+        return llm
+    return await asyncio.to_thread(get_llm)
+
+# Template text: literal braces are doubled for ChatPromptTemplate
+ANALYSIS_PROMPT = """Analyze this food image and provide a comprehensive nutritional assessment:
 
 🔍 **FOOD IDENTIFICATION**
 - List all visible food items and ingredients
@@ -50,13 +89,46 @@ async def analyze_food_image(image_base64: str, user_id: str) -> tuple[str, str]
 - Key nutritional highlights
 - Main takeaway
 
-Be specific with numbers and explain your reasoning.""",
+Be specific with numbers and explain your reasoning.
+
+Finally, after the summary, add a JSON code block with your estimates for the whole meal, using exactly these keys (numbers only; nutrients in grams, quality score 1-10):
+```json
+{{"calories": 0, "carbs_g": 0, "protein_g": 0, "fat_g": 0, "fiber_g": 0, "sugar_g": 0, "quality_score": 0}}
+```"""
+
+# Start of the structured JSON block requested at the end of ANALYSIS_PROMPT
+NUTRITION_BLOCK_MARKER = "```json"
+NUTRITION_BLOCK_PATTERN = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+
+# Markers of the section headings requested in ANALYSIS_PROMPT
+SECTION_MARKERS = ("🔍", "📊", "⚖️", "💡", "🎯")
+
+
+def build_prompt(image: PreparedImage) -> "ChatPromptTemplate":
+    """Build the analysis prompt for a normalized image"""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    with stage("base64_encode").time():
+        image_url = encode_image(image.data, prefix=f"data:{image.mime_type};base64,")
+
+    return ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are a professional nutrition expert and certified dietitian. Provide detailed, accurate nutritional analysis.",
+            ),
+            (
+                "human",
+                [
+                    {
+                        "type": "text",
+                        "text": ANALYSIS_PROMPT,
                     },
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
-                            "detail": "high",
+                            "url": image_url,
+                            "detail": image.detail,
                         },
                     },
                 ],
@@ -64,18 +136,166 @@ Be specific with numbers and explain your reasoning.""",
         ]
     )
 
-    chain = prompt | llm
-    res = await chain.ainvoke({})
 
-    # Save analysis to database
-    analysis_id = str(uuid.uuid4())
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO analyses (id, user_id, analysis_result) VALUES (?, ?, ?)",
-        (analysis_id, user_id, res.content),
+def split_report(report: str) -> tuple[str, Optional[NutritionFacts]]:
+    """Split an LLM report into its prose and validated nutrition facts.
+
+    The JSON block is removed from the prose. Facts are None when the block is
+    missing or does not validate.
+    """
+    match = NUTRITION_BLOCK_PATTERN.search(report)
+    if match is None:
+        return report.strip(), None
+
+    prose = (report[:match.start()] + report[match.end():]).strip()
+    try:
+        nutrition = NutritionFacts.model_validate(json.loads(match.group(1)))
+    except (json.JSONDecodeError, ValidationError) as e:
+        print(f"Invalid nutrition block: {e}")
+        nutrition = None
+    return prose, nutrition
+
+
+async def stream_analysis(image_content: bytes) -> AsyncIterator[str]:
+    """Stream the raw analysis report (see split_report) for an image as text chunks.
+
+    A cached result is yielded as a single chunk. Otherwise the LLM output is
+    streamed and the full text is added to the cache once the stream completes.
+    Closing the iterator early cancels the upstream LLM call.
+    """
+    cache_key = analysis_cache.make_key(image_content)
+    cached = await analysis_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    image = await prepare_image(image_content)
+    model = await aget_llm()
+    chain = build_prompt(image) | model
+    parts = []
+    start = time.perf_counter()
+    async for chunk in llm_resilience.stream(lambda: chain.astream({})):
+        if chunk.content:
+            if not parts:
+                stage("llm_first_token").observe(time.perf_counter() - start)
+            parts.append(chunk.content)
+            yield chunk.content
+    stage("llm_stream").observe(time.perf_counter() - start)
+
+    await analysis_cache.put(cache_key, "".join(parts))
+
+
+async def prepare_image(image_content: bytes) -> PreparedImage:
+    """Normalize an uploaded image in a worker thread"""
+    with stage("image_normalize").time():
+        image = await asyncio.to_thread(normalize_image, image_content)
+    LLM_IMAGE_BYTES.observe(len(image.data))
+    return image
+
+
+async def run_analysis(image_content: bytes) -> str:
+    """Normalize a single image and call the LLM for it"""
+    image = await prepare_image(image_content)
+    model = await aget_llm()
+    chain = build_prompt(image) | model
+    with stage("llm").time():
+        res = await llm_resilience.call(lambda: chain.ainvoke({}))
+    return res.content
+
+
+def save_analyses(
+    user_id: str,
+    analyses: list[tuple[str, Optional[NutritionFacts]]],
+    thumbnails: Optional[list[Optional[str]]] = None,
+    on_saved: Optional[Callable[[sqlite3.Connection, list[str]], None]] = None,
+) -> list[str]:
+    """Save several (analysis_result, nutrition) pairs, with optional thumbnail
+    hashes, in one transaction (search index included) and return their IDs.
+
+    ``on_saved(conn, analysis_ids)`` runs inside that transaction; if it
+    raises, nothing is saved.
+    """
+    analysis_ids = [str(uuid.uuid4()) for _ in analyses]
+    thumbnails = thumbnails or [None] * len(analyses)
+    rows = []
+    for analysis_id, (analysis_result, nutrition), thumbnail_hash in zip(
+        analysis_ids, analyses, thumbnails
+    ):
+        facts = nutrition or NutritionFacts()
+        stored = compress_text(analysis_result) if settings.ANALYSIS_COMPRESSION else analysis_result
+        rows.append((
+            analysis_id, user_id, stored, make_preview(analysis_result),
+            facts.calories, facts.carbs_g, facts.protein_g, facts.fat_g,
+            facts.fiber_g, facts.sugar_g, facts.quality_score, thumbnail_hash,
+        ))
+    with stage("db_insert").time(), db_connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO analyses (
+                id, user_id, analysis_result, preview, calories, carbs_g,
+                protein_g, fat_g, fiber_g, sugar_g, quality_score, thumbnail_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        index_analyses(conn, [
+            (analysis_id, user_id, analysis_result)
+            for analysis_id, (analysis_result, _) in zip(analysis_ids, analyses)
+        ])
+        if on_saved is not None:
+            on_saved(conn, analysis_ids)
+    response_cache.invalidate(user_id)
+    return analysis_ids
+
+
+def load_analysis(analysis_id: str, user_id: str) -> Optional[tuple[str, str, Optional[str]]]:
+    """Load an analysis owned by user_id as (analysis_result, created_at, thumbnail_hash),
+    whether it is live or archived"""
+    with db_connection() as conn:
+        row = conn.execute(
+            "SELECT analysis_result, created_at, thumbnail_hash FROM all_analyses WHERE id = ? AND user_id = ?",
+            (analysis_id, user_id),
+        ).fetchone()
+    return (decompress_text(row[0]), row[1], row[2]) if row else None
+
+
+def save_analysis(
+    user_id: str,
+    analysis_result: str,
+    nutrition: Optional[NutritionFacts] = None,
+    thumbnail_hash: Optional[str] = None,
+    on_saved: Optional[Callable[[sqlite3.Connection, list[str]], None]] = None,
+) -> str:
+    """Save an analysis to the database and return its ID"""
+    return save_analyses(user_id, [(analysis_result, nutrition)], [thumbnail_hash], on_saved)[0]
+
+
+async def get_analysis(image_content: bytes) -> tuple[str, Optional[NutritionFacts]]:
+    """Return the analysis prose and nutrition facts for an image, from the
+    analysis cache when possible"""
+    cache_key = analysis_cache.make_key(image_content)
+    report = await analysis_cache.get_or_compute(
+        cache_key, lambda: run_analysis(image_content)
     )
-    conn.commit()
-    conn.close()
+    return split_report(report)
 
-    return res.content, analysis_id
+
+async def analyze_food_image(
+    image_content: bytes,
+    user_id: str,
+    on_saved: Optional[Callable[[sqlite3.Connection, list[str]], None]] = None,
+) -> tuple[str, str, Optional[NutritionFacts]]:
+    """Analyze food image using AI and save to database.
+
+    Results are served from the analysis cache when the same image was analyzed
+    before; every call still records its own row with a fresh analysis ID.
+    A thumbnail of the image is stored once the analysis has succeeded.
+    ``on_saved`` is passed to save_analyses.
+    Returns (analysis_result, analysis_id, nutrition).
+    """
+    analysis_result, nutrition = await get_analysis(image_content)
+    thumbnail_hash = await save_thumbnail(image_content)
+    analysis_id = await run_db(
+        save_analysis, user_id, analysis_result, nutrition, thumbnail_hash, on_saved
+    )
+    return analysis_result, analysis_id, nutrition
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from config.settings import settings
+from config.database import db_connection, run_db
+
+
+class AnalysisCache:
+    """Content-addressed cache of analysis results.
+
+    Results are looked up in an in-memory LRU first, then in the persistent
+    ``analysis_cache`` SQLite table. Concurrent misses for the same key share a
+    single in-flight computation, so identical uploads only pay for one LLM call.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int, disk_ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._size = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(image_content: bytes) -> str:
+        """Build the cache key from the raw image bytes, model, prompt version
+        and image normalization settings"""
+        digest = hashlib.sha256()
+        digest.update(
+            f"{settings.GEMINI_MODEL}:{settings.PROMPT_VERSION}:"
+            f"{settings.IMAGE_MAX_EDGE}:{settings.IMAGE_FORMAT}:{settings.IMAGE_QUALITY}:".encode()
+        )
+        digest.update(image_content)
+        return digest.hexdigest()
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[str]]
+    ) -> str:
+        """Return the cached result for ``key`` or compute (and cache) it once"""
+        result = self._get_memory(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Run the load in its own task so a cancelled caller does not
+            # abort the work other callers are waiting on
+            task = asyncio.ensure_future(self._load(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        return await asyncio.shield(task)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached result without computing it"""
+        result = self._get_memory(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        result = await run_db(self._get_disk, key)
+        if result is not None:
+            self.disk_hits += 1
+            self._put_memory(key, result)
+        else:
+            self.misses += 1
+        return result
+
+    async def put(self, key: str, result: str):
+        """Store a result in both tiers"""
+        if not result:
+            return
+        self._put_memory(key, result)
+        await run_db(self._put_disk, key, result)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "in_flight": len(self._inflight),
+        }
+
+    async def _load(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        result = await run_db(self._get_disk, key)
+        if result is not None:
+            self.disk_hits += 1
+            self._put_memory(key, result)
+            return result
+
+        self.misses += 1
+        result = await compute()
+        await self.put(key, result)
+        return result
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _put_memory(self, key: str, result: str):
+        size = len(result.encode())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (time.monotonic(), result)
+        self._size += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._size > self.max_bytes
+        ):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        _, result = self._entries.pop(key)
+        self._size -= len(result.encode())
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        with db_connection() as conn:
+            row = conn.execute(
+                "SELECT analysis_result FROM analysis_cache WHERE cache_key = ? AND created_at > ?",
+                (key, time.time() - self.disk_ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _put_disk(self, key: str, result: str):
+        with db_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (cache_key, analysis_result, created_at) VALUES (?, ?, ?)",
+                (key, result, time.time()),
+            )
+            # Expired rows are purged periodically rather than on every write
+            self._disk_writes += 1
+            if self._disk_writes % 100 == 0:
+                conn.execute(
+                    "DELETE FROM analysis_cache WHERE created_at <= ?",
+                    (time.time() - self.disk_ttl,),
+                )
+
+
+analysis_cache = AnalysisCache(
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    max_bytes=settings.ANALYSIS_CACHE_MAX_BYTES,
+    ttl=settings.ANALYSIS_CACHE_TTL,
+    disk_ttl=settings.ANALYSIS_CACHE_DISK_TTL,
+)
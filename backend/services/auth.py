@@ -1,8 +1,10 @@
-import requests
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from models.schemas import UserInfo
 from config.settings import settings
+from services.clerk_client import clerk_users
+from services.jwks import jwks_verifier
+from services.metrics import stage
 import jwt
 
 security = HTTPBearer()
@@ -12,16 +14,24 @@ async def verify_clerk_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> UserInfo:
     """Verify Clerk JWT token and return user info"""
+    with stage("auth").time():
+        return await _verify_token(credentials.credentials)
+
+
+async def _verify_token(token: str) -> UserInfo:
     try:
-        token = credentials.credentials
         print(f"DEBUG: Received token: {token[:20]}...")
         print(f"DEBUG: Clerk Secret Key exists: {bool(settings.CLERK_SECRET_KEY)}")
 
-        # Method 1: Decode JWT directly (simpler approach)
         try:
-            # For development, we can decode without verification
-            # In production, you should verify the signature
-            decoded = jwt.decode(token, options={"verify_signature": False})
+            with stage("jwt_decode").time():
+                if jwks_verifier is not None:
+                    # Verify signature, expiry and issuer locally against the cached JWKS
+                    decoded = await jwks_verifier.verify(token)
+                else:
+                    # For development, we can decode without verification
+                    # Set CLERK_JWKS_URL in production to verify the signature
+                    decoded = jwt.decode(token, options={"verify_signature": False})
             user_id = decoded.get("sub")
 
             if not user_id:
@@ -29,26 +39,15 @@ async def verify_clerk_token(
 
             print(f"DEBUG: Decoded user_id: {user_id}")
 
-            # Get user details from Clerk API
-            headers = {
-                "Authorization": f"Bearer {settings.CLERK_SECRET_KEY}",
-                "Content-Type": "application/json",
-            }
-
-            user_response = requests.get(
-                f"https://api.clerk.dev/v1/users/{user_id}", headers=headers
-            )
+            # Verified tokens that carry the email need no Clerk round-trip
+            email = decoded.get("email") if jwks_verifier is not None else None
+            if not email:
+                # Get user details from Clerk API (cached per user)
+                email = await clerk_users.get_email(user_id)
 
-            print(f"DEBUG: Clerk API response status: {user_response.status_code}")
-
-            if user_response.status_code != 200:
-                print(f"DEBUG: Clerk API error: {user_response.text}")
+            if email is None:
                 # Fallback: use decoded token data
                 email = decoded.get("email", "unknown@example.com")
-                return UserInfo(user_id=user_id, email=email)
-
-            user_data = user_response.json()
-            email = user_data.get("email_addresses", [{}])[0].get("email_address", "")
 
             return UserInfo(user_id=user_id, email=email)
 
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+from config.settings import settings
+from utils.image_processing import make_thumbnail
+
+
+class BlobStore:
+    """Content-addressed on-disk store of immutable blobs.
+
+    Blobs are named by the SHA-256 of their content and sharded into two
+    directory levels (``ab/cd/abcd...``), so identical content is stored once
+    however many analyses (or users) reference it. Once the store grows past
+    ``max_bytes`` the least recently used blobs (by mtime, refreshed whenever a
+    blob is stored again or served) are evicted; references to an evicted blob
+    simply stop resolving.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self.writes = 0
+        self.dedup_hits = 0
+
+    def path(self, blob_hash: str) -> Path:
+        return self.directory / blob_hash[:2] / blob_hash[2:4] / blob_hash
+
+    def find(self, blob_hash: str) -> Optional[Path]:
+        """Path of a stored blob, or None if it is unknown or was evicted"""
+        if len(blob_hash) != 64 or not all(c in "0123456789abcdef" for c in blob_hash):
+            return None
+        path = self.path(blob_hash)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` (if not already present) and return its hash"""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(blob_hash)
+        if path.exists():
+            os.utime(path)
+            self.dedup_hits += 1
+            return blob_hash
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._files())
+
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._size += len(data)
+        self.writes += 1
+
+        if self._size > self.max_bytes:
+            self._evict()
+        return blob_hash
+
+    def stats(self) -> dict:
+        return {
+            "writes": self.writes,
+            "dedup_hits": self.dedup_hits,
+            "bytes": self._size,
+        }
+
+    def _files(self) -> list[tuple[float, int, Path]]:
+        files = []
+        for path in self.directory.glob("??/??/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self):
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+
+thumbnail_store = BlobStore(settings.THUMBNAIL_DIR, settings.THUMBNAIL_STORE_MAX_BYTES)
+
+
+async def save_thumbnail(image_content: bytes) -> Optional[str]:
+    """Store a compact thumbnail of an uploaded image and return its hash.
+
+    Thumbnails are optional extras, so failures are logged and return None.
+    """
+    def make_and_store() -> str:
+        return thumbnail_store.put(make_thumbnail(image_content))
+
+    try:
+        return await asyncio.to_thread(make_and_store)
+    except Exception as e:
+        print(f"Error storing thumbnail: {e}")
+        return None
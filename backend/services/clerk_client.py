@@ -0,0 +1,146 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+import httpx
+from config.settings import settings
+from services.metrics import stage
+
+
+class ClerkUserCache:
+    """Pooled async client for the Clerk users API with a TTL cache of emails.
+
+    Successful lookups are cached for ``ttl`` seconds and then served stale for
+    up to ``stale_ttl`` more while a background refresh runs. Failed lookups are
+    cached as ``None`` for ``negative_ttl`` so a Clerk outage or unknown user
+    does not cost a round-trip on every request.
+    """
+
+    def __init__(self, ttl: int, negative_ttl: int, stale_ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._client: Optional[httpx.AsyncClient] = None
+        self._entries: "OrderedDict[str, tuple[float, Optional[str]]]" = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._latencies: deque = deque(maxlen=256)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=settings.CLERK_API_URL,
+                headers={
+                    "Authorization": f"Bearer {settings.CLERK_SECRET_KEY}",
+                    "Content-Type": "application/json",
+                },
+                timeout=httpx.Timeout(settings.CLERK_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.CLERK_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.CLERK_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_email(self, user_id: str) -> Optional[str]:
+        """Return the user's primary email, or None if Clerk has no answer"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            fetched_at, email = entry
+            age = time.monotonic() - fetched_at
+            if age < (self.ttl if email is not None else self.negative_ttl):
+                self.hits += 1
+                self._entries.move_to_end(user_id)
+                return email
+            if email is not None and age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(user_id)
+                return email
+
+        self.misses += 1
+        return await asyncio.shield(self._refresh(user_id))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        latencies = sorted(self._latencies)
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "upstream_latency_ms": {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                "p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+            },
+        }
+
+    def _refresh(self, user_id: str) -> asyncio.Task:
+        """Start (or join) a lookup for user_id"""
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(user_id))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        return task
+
+    async def _fetch(self, user_id: str) -> Optional[str]:
+        self.upstream_calls += 1
+        start = time.perf_counter()
+        try:
+            response = await self._get_client().get(f"/users/{user_id}")
+            print(f"DEBUG: Clerk API response status: {response.status_code}")
+            if response.status_code != 200:
+                print(f"DEBUG: Clerk API error: {response.text}")
+                self.upstream_errors += 1
+                return self._store_failure(user_id)
+
+            user_data = response.json()
+            email = (user_data.get("email_addresses") or [{}])[0].get("email_address", "")
+        # A malformed body (non-JSON or unexpected shape) counts as an upstream failure
+        except (httpx.HTTPError, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            print(f"DEBUG: Clerk API request failed: {e!r}")
+            self.upstream_errors += 1
+            return self._store_failure(user_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._latencies.append(elapsed)
+            stage("clerk_lookup").observe(elapsed)
+
+        self._store(user_id, email)
+        return email
+
+    def _store_failure(self, user_id: str) -> Optional[str]:
+        # Keep serving a stale email while it is in its window; otherwise cache the miss
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] is not None:
+            if time.monotonic() - entry[0] < self.ttl + self.stale_ttl:
+                return entry[1]
+        self._store(user_id, None)
+        return None
+
+    def _store(self, user_id: str, email: Optional[str]):
+        self._entries[user_id] = (time.monotonic(), email)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+clerk_users = ClerkUserCache(
+    ttl=settings.USER_CACHE_TTL,
+    negative_ttl=settings.USER_CACHE_NEGATIVE_TTL,
+    stale_ttl=settings.USER_CACHE_STALE_TTL,
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import sqlite3
+import time
+from config.database import ANALYSIS_COLUMNS, get_db_connection
+from config.settings import settings
+from utils.compression import compress_text
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+PLACEHOLDERS = ", ".join("?" for _ in ANALYSIS_COLUMNS.split(","))
+
+
+def is_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+
+
+def convert_to_incremental_vacuum() -> bool:
+    """Switch a database created without auto_vacuum to incremental mode.
+
+    Changing the mode of an existing database needs one full VACUUM, which
+    rewrites the file under an exclusive lock, so this is a maintenance step
+    (``python -m services.compaction --convert``, with the app stopped) and
+    never runs from the background loop. Returns True if it converted.
+    """
+    conn = get_db_connection()
+    try:
+        if is_incremental_vacuum(conn):
+            return False
+        print("DEBUG: Converting database to incremental auto_vacuum (full VACUUM)")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+def archive_batch(conn: sqlite3.Connection, cutoff: str, limit: int) -> int:
+    """Move up to ``limit`` of the oldest analyses created before ``cutoff``.
+
+    Rows move oldest first, so every archived analysis is older than every
+    live one. Text still stored uncompressed is compressed on the way.
+    """
+    rows = conn.execute(
+        f"""
+        SELECT {ANALYSIS_COLUMNS} FROM analyses
+        WHERE created_at < ?
+        ORDER BY created_at, id
+        LIMIT ?
+        """,
+        (cutoff, limit),
+    ).fetchall()
+    if not rows:
+        return 0
+
+    if settings.ANALYSIS_COMPRESSION:
+        rows = [
+            (row[0], row[1], compress_text(row[2]) if isinstance(row[2], str) else row[2], *row[3:])
+            for row in rows
+        ]
+    with conn:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO analyses_archive ({ANALYSIS_COLUMNS}) VALUES ({PLACEHOLDERS})",
+            rows,
+        )
+        conn.executemany("DELETE FROM analyses WHERE id = ?", [(row[0],) for row in rows])
+    return len(rows)
+
+
+def incremental_vacuum(conn: sqlite3.Connection) -> int:
+    """Release free pages in COMPACTION_VACUUM_PAGES steps; returns pages freed"""
+    freed = 0
+    while True:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free_pages == 0:
+            return freed
+        step = min(free_pages, settings.COMPACTION_VACUUM_PAGES)
+        # The pragma frees one page per step and returns no rows, so execute()
+        # would stop after the first page; executescript runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({step})")
+        freed += free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def compact() -> dict:
+    """Archive analyses older than ARCHIVE_AFTER_DAYS, then release free pages.
+
+    Runs every COMPACTION_INTERVAL seconds (see main.py), or once with
+    ``python -m services.compaction`` from the backend directory. Databases
+    created before incremental auto_vacuum was enabled keep their free pages
+    (reused, never released) until an operator runs
+    ``python -m services.compaction --convert`` once per database.
+    """
+    start = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        incremental = is_incremental_vacuum(conn)
+        cutoff = conn.execute(
+            "SELECT DATETIME('now', ?)", (f"-{settings.ARCHIVE_AFTER_DAYS} days",)
+        ).fetchone()[0]
+
+        archived = 0
+        while True:
+            moved = archive_batch(conn, cutoff, settings.COMPACTION_BATCH_SIZE)
+            archived += moved
+            if moved < settings.COMPACTION_BATCH_SIZE:
+                break
+        freed_pages = incremental_vacuum(conn) if incremental else 0
+    finally:
+        conn.close()
+
+    if not incremental:
+        print("DEBUG: Database is not in incremental auto_vacuum mode; run "
+              "python -m services.compaction --convert during maintenance to release free pages")
+    return {
+        "archived": archived,
+        "freed_pages": freed_pages,
+        "incremental_vacuum": incremental,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+async def compaction_loop():
+    """Compact every COMPACTION_INTERVAL seconds until cancelled"""
+    while True:
+        await asyncio.sleep(settings.COMPACTION_INTERVAL)
+        try:
+            result = await asyncio.to_thread(compact)
+            print(f"DEBUG: Compaction finished: {result}")
+        except Exception as e:
+            print(f"Error compacting database: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old analyses and release free pages")
+    parser.add_argument(
+        "--convert", action="store_true",
+        help="first switch the database to incremental auto_vacuum (full VACUUM; stop the app first)",
+    )
+    args = parser.parse_args()
+    if args.convert:
+        print({"converted_to_incremental_vacuum": convert_to_incremental_vacuum()})
+    print(compact())
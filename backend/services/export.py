@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, NamedTuple, Optional
+from fastapi.responses import StreamingResponse
+from config.database import db_connection, run_db
+from config.settings import settings
+from utils.compression import decompress_text
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class ExportSource(NamedTuple):
+    """A table to export: its columns, an optional filter and a unique sort key.
+
+    Rows are read in keyset order on ``key`` (leading columns of an index, or
+    ``rowid``), which is selected alongside ``columns`` so the next batch can
+    seek past the last row.
+    """
+    table: str
+    columns: tuple[str, ...]
+    key: tuple[str, ...]
+    where: str = "1"
+    params: tuple = ()
+
+
+ANALYSIS_COLUMNS = (
+    "id", "user_id", "analysis_result", "calories", "carbs_g", "protein_g",
+    "fat_g", "fiber_g", "sugar_g", "quality_score", "created_at",
+)
+USAGE_COLUMNS = (
+    "user_id", "email", "daily_requests", "last_request_date", "total_requests", "created_at",
+)
+
+
+def analyses_source(user_id: Optional[str] = None) -> ExportSource:
+    """Live and archived analyses of one user, or of everyone.
+
+    Both keys lead the (user_id, created_at, id) indexes of the two tables
+    behind all_analyses, so SQLite merges the tables instead of sorting.
+    """
+    if user_id is None:
+        return ExportSource("all_analyses", ANALYSIS_COLUMNS, ("user_id", "created_at", "id"))
+    return ExportSource(
+        "all_analyses", ANALYSIS_COLUMNS, ("created_at", "id"), "user_id = ?", (user_id,)
+    )
+
+
+def usage_source(user_id: Optional[str] = None) -> ExportSource:
+    if user_id is None:
+        return ExportSource("user_usage", USAGE_COLUMNS, ("rowid",))
+    return ExportSource("user_usage", USAGE_COLUMNS, ("rowid",), "user_id = ?", (user_id,))
+
+
+def fetch_batch(source: ExportSource, after: Optional[tuple], limit: int) -> list[tuple]:
+    """Fetch up to ``limit`` rows following ``after`` (a key value) in key order.
+
+    Each batch is its own short read on a pooled connection, so an export
+    never keeps a transaction (or a connection) open between batches.
+    """
+    key = ", ".join(source.key)
+    where, params = source.where, source.params
+    if after is not None:
+        placeholders = ", ".join("?" * len(after))
+        where = f"{where} AND ({key}) > ({placeholders})"
+        params = (*params, *after)
+    with db_connection() as conn:
+        return conn.execute(
+            f"""
+            SELECT {key}, {", ".join(source.columns)} FROM {source.table}
+            WHERE {where}
+            ORDER BY {key}
+            LIMIT ?
+            """,
+            (*params, limit),
+        ).fetchall()
+
+
+async def iter_rows(source: ExportSource) -> AsyncIterator[list[tuple]]:
+    """Yield the rows of ``source`` a batch at a time (key columns stripped)"""
+    size = len(source.key)
+    after = None
+    while True:
+        rows = await run_db(fetch_batch, source, after, settings.EXPORT_BATCH_SIZE)
+        if rows:
+            # Compressed analysis text is the only BLOB value in exported tables
+            yield [
+                tuple(decompress_text(value) if isinstance(value, bytes) else value for value in row[size:])
+                for row in rows
+            ]
+        if len(rows) < settings.EXPORT_BATCH_SIZE:
+            return
+        after = rows[-1][:size]
+
+
+def _encode_ndjson(columns: tuple[str, ...], rows: list[tuple]) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows
+    ).encode()
+
+
+def _encode_csv(rows: list[tuple]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def export_rows(source: ExportSource, fmt: str, compress: bool = False) -> AsyncIterator[bytes]:
+    """Stream ``source`` as NDJSON or CSV (with a header row), optionally gzipped.
+
+    Memory use is bounded by one batch whatever the table size.
+    """
+    compressor = zlib.compressobj(settings.EXPORT_GZIP_LEVEL, wbits=31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        header = emit(_encode_csv([source.columns]))
+        if header:
+            yield header
+    async for rows in iter_rows(source):
+        data = emit(_encode_ndjson(source.columns, rows) if fmt == "ndjson" else _encode_csv(rows))
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+def export_response(source: ExportSource, name: str, fmt: str, compress: bool) -> StreamingResponse:
+    """Download ``source`` as ``name.<fmt>`` (``.gz`` when compressed)"""
+    filename = f"{name}.{fmt}.gz" if compress else f"{name}.{fmt}"
+    return StreamingResponse(
+        export_rows(source, fmt, compress),
+        media_type="application/gzip" if compress else MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Cache-Control": "no-store",
+        },
+    )
@@ -0,0 +1,291 @@
+import asyncio
+import sqlite3
+import time
+import uuid
+from typing import Optional
+import anyio
+from config.database import db_connection, run_db
+from config.settings import settings
+from models.schemas import JobStatusResponse, NutritionFacts
+from services.ai_service import analyze_food_image
+from services.rate_limiter import refund_requests
+from services.resilience import CircuitOpenError
+from utils.compression import decompress_text
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+# Claim the oldest runnable job in one statement, so workers in any process
+# never pick up the same job. A job is runnable when it is queued (and past
+# its retry delay) or when it is running but its lease has expired, i.e. the
+# process running it died.
+CLAIM_SQL = """
+    UPDATE analysis_jobs
+    SET status = 'running', attempts = attempts + 1, locked_until = :lease,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = (
+        SELECT id FROM analysis_jobs
+        WHERE status IN ('queued', 'running') AND COALESCE(locked_until, 0) < :now
+        ORDER BY created_at
+        LIMIT 1
+    )
+    RETURNING id, user_id, image, attempts
+"""
+
+
+def enqueue_job(user_id: str, image: bytes) -> str:
+    """Persist a new job for an uploaded image and return its ID"""
+    job_id = str(uuid.uuid4())
+    with db_connection() as conn:
+        conn.execute(
+            "INSERT INTO analysis_jobs (id, user_id, image) VALUES (?, ?, ?)",
+            (job_id, user_id, image),
+        )
+    return job_id
+
+
+def claim_job() -> Optional[tuple[str, str, bytes, int]]:
+    """Lease the next runnable job as (id, user_id, image, attempts)"""
+    now = time.time()
+    with db_connection() as conn:
+        row = conn.execute(
+            CLAIM_SQL, {"now": now, "lease": now + settings.JOB_LEASE_SECONDS}
+        ).fetchone()
+    return tuple(row) if row else None
+
+
+def _update_job(job_id: str, assignments: str, params: tuple = ()):
+    with db_connection() as conn:
+        conn.execute(
+            f"UPDATE analysis_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (*params, job_id),
+        )
+
+
+class JobLeaseLost(Exception):
+    """The job's lease expired and another worker claimed it"""
+
+
+def finish_job(conn: sqlite3.Connection, job_id: str, attempts: int, analysis_id: str):
+    """Mark a job succeeded inside the transaction that saves its analysis.
+
+    Raises JobLeaseLost (rolling the analysis back) if this attempt no longer
+    holds the job, so an analysis is saved at most once per job.
+    """
+    cursor = conn.execute(
+        """
+        UPDATE analysis_jobs
+        SET status = 'succeeded', analysis_id = ?, error = NULL, image = NULL,
+            locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'running' AND attempts = ?
+        """,
+        (analysis_id, job_id, attempts),
+    )
+    if cursor.rowcount == 0:
+        raise JobLeaseLost(job_id)
+
+
+def fail_job(job_id: str, error: str):
+    _update_job(job_id, "status = 'failed', error = ?, image = NULL, locked_until = NULL", (error,))
+
+
+def retry_job(job_id: str, error: str, delay: float):
+    """Queue a job again, runnable after ``delay`` seconds"""
+    _update_job(
+        job_id, "status = 'queued', error = ?, locked_until = ?", (error, time.time() + delay)
+    )
+
+
+def release_job(job_id: str, delay: float = 0):
+    """Return an interrupted job to the queue without counting the attempt"""
+    _update_job(
+        job_id,
+        "status = 'queued', attempts = MAX(attempts - 1, 0), locked_until = ?",
+        (time.time() + delay if delay else None,),
+    )
+
+
+def purge_jobs() -> int:
+    """Delete finished jobs older than JOB_RETENTION_DAYS"""
+    with db_connection() as conn:
+        cursor = conn.execute(
+            """
+            DELETE FROM analysis_jobs
+            WHERE status IN ('succeeded', 'failed') AND updated_at < DATETIME('now', ?)
+            """,
+            (f"-{settings.JOB_RETENTION_DAYS} days",),
+        )
+    return cursor.rowcount
+
+
+def load_job(job_id: str, user_id: str) -> Optional[JobStatusResponse]:
+    """Load a job owned by user_id, with its analysis once it succeeded"""
+    with db_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT id, status, attempts, analysis_id, error, created_at, updated_at
+            FROM analysis_jobs
+            WHERE id = ? AND user_id = ?
+            """,
+            (job_id, user_id),
+        ).fetchone()
+        if row is None:
+            return None
+        # Looked up separately: a join against the all_analyses view would
+        # materialize the whole view
+        analysis = None
+        if row[3] is not None:
+            analysis = conn.execute(
+                """
+                SELECT analysis_result, calories, carbs_g, protein_g, fat_g,
+                       fiber_g, sugar_g, quality_score
+                FROM all_analyses
+                WHERE id = ?
+                """,
+                (row[3],),
+            ).fetchone()
+
+    text = nutrition = None
+    if analysis is not None:
+        text = decompress_text(analysis[0])
+        if analysis[1] is not None:
+            nutrition = NutritionFacts(
+                calories=analysis[1], carbs_g=analysis[2], protein_g=analysis[3],
+                fat_g=analysis[4], fiber_g=analysis[5], sugar_g=analysis[6],
+                quality_score=analysis[7],
+            )
+    return JobStatusResponse(
+        job_id=row[0],
+        status=row[1],
+        attempts=row[2],
+        analysis_id=row[3],
+        error=row[4],
+        created_at=row[5],
+        updated_at=row[6],
+        analysis=text,
+        nutrition=nutrition,
+    )
+
+
+class JobQueue:
+    """Pool of async workers draining the ``analysis_jobs`` table.
+
+    Jobs live in SQLite, so they survive restarts: a job left running by a
+    process that died is retried once its lease expires, and jobs interrupted
+    by a clean shutdown are returned to the queue. Workers are woken as soon
+    as a job is submitted in this process and poll every JOB_POLL_INTERVAL
+    otherwise (to pick up retries and jobs from other processes).
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._finished = asyncio.Condition()
+        self._last_purge = 0.0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, user_id: str, image: bytes) -> str:
+        job_id = await run_db(enqueue_job, user_id, image)
+        self._wakeup.set()
+        return job_id
+
+    async def wait(self, job_id: str, user_id: str, timeout: float) -> Optional[JobStatusResponse]:
+        """Return the job once it has finished or ``timeout`` seconds have passed"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await run_db(load_job, job_id, user_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in FINISHED_STATUSES or remaining <= 0:
+                return job
+            async with self._finished:
+                try:
+                    await asyncio.wait_for(
+                        self._finished.wait(), min(remaining, settings.JOB_POLL_INTERVAL)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await run_db(claim_job)
+            except Exception as e:
+                print(f"Error claiming analysis job: {e}")
+                job = None
+
+            if job is None:
+                await self._purge_if_due()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(*job)
+            except Exception as e:
+                # The lease expires and the job is retried
+                print(f"Error finishing analysis job {job[0]}: {e}")
+            async with self._finished:
+                self._finished.notify_all()
+
+    async def _run(self, job_id: str, user_id: str, image: bytes, attempts: int):
+        if attempts > settings.JOB_MAX_ATTEMPTS:
+            # Interrupted (lease expired) on every attempt
+            await run_db(fail_job, job_id, "The analysis could not be completed. Please try again.")
+            await run_db(refund_requests, user_id)
+            return
+
+        def on_saved(conn: sqlite3.Connection, analysis_ids: list[str]):
+            finish_job(conn, job_id, attempts, analysis_ids[0])
+
+        try:
+            # The analysis and the job's completion are committed together,
+            # so a retried job never saves a second analysis
+            await analyze_food_image(image, user_id, on_saved)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so the next worker picks it up
+            with anyio.CancelScope(shield=True):
+                await run_db(release_job, job_id)
+            raise
+        except JobLeaseLost:
+            print(f"DEBUG: Job {job_id} was claimed by another worker; dropping attempt {attempts}")
+        except CircuitOpenError as e:
+            # The LLM is failing fast; try again once the circuit may close
+            await run_db(release_job, job_id, e.retry_after)
+        except ValueError as e:
+            print(f"Error decoding image for job {job_id}: {e}")
+            await run_db(fail_job, job_id, "The uploaded file could not be read as an image.")
+            await run_db(refund_requests, user_id)
+        except Exception as e:
+            print(f"Error running analysis job {job_id} (attempt {attempts}): {e}")
+            error = "An error occurred while processing the image."
+            if attempts < settings.JOB_MAX_ATTEMPTS:
+                await run_db(retry_job, job_id, error, min(2 ** attempts, 60))
+            else:
+                await run_db(fail_job, job_id, error + " Please try again.")
+                await run_db(refund_requests, user_id)
+
+    async def _purge_if_due(self):
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            purged = await run_db(purge_jobs)
+            if purged:
+                print(f"DEBUG: Purged {purged} finished analysis jobs")
+        except Exception as e:
+            print(f"Error purging analysis jobs: {e}")
+
+
+job_queue = JobQueue(settings.JOB_WORKERS)
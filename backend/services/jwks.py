@@ -0,0 +1,119 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+import httpx
+import jwt
+from config.settings import settings
+
+
+class JWKSVerifier:
+    """Verify JWTs locally against the issuer's cached JWKS key set.
+
+    Keys are fetched once and refetched only when a token references an
+    unknown ``kid``, which picks up key rotation without a network call per
+    request. Fetches (including failed or empty ones) happen at most once per
+    ``min_refresh_interval``. Tokens must come from ``issuer``. Verified
+    tokens are memoized until they expire.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        issuer: str,
+        min_refresh_interval: int = 60,
+        leeway: int = 5,
+        cache_size: int = 10_000,
+    ):
+        if not issuer:
+            raise ValueError("JWKS verification requires an issuer (set CLERK_ISSUER)")
+        self.jwks_url = jwks_url
+        self.issuer = issuer
+        self.min_refresh_interval = min_refresh_interval
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._last_fetch = float("-inf")
+        self._lock = asyncio.Lock()
+        self._verified: "OrderedDict[str, dict]" = OrderedDict()
+
+    async def verify(self, token: str) -> dict:
+        """Return the token's claims, raising jwt.InvalidTokenError if invalid"""
+        claims = self._verified.get(token)
+        if claims is not None:
+            if claims["exp"] > time.time() - self.leeway:
+                self._verified.move_to_end(token)
+                return claims
+            del self._verified[token]
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = await self._get_key(kid)
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=[key.algorithm_name],
+            issuer=self.issuer,
+            leeway=self.leeway,
+            options={"require": ["exp", "sub", "iss"]},
+        )
+
+        self._verified[token] = claims
+        while len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+        return claims
+
+    async def _get_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        if kid not in self._keys:
+            async with self._lock:
+                # Another request may have refreshed while we waited
+                if (
+                    kid not in self._keys
+                    and time.monotonic() - self._last_fetch >= self.min_refresh_interval
+                ):
+                    await self._refresh()
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+        return key
+
+    async def _refresh(self):
+        # Stamped before fetching so a failed fetch is not retried until the
+        # interval has passed; the previous keys stay in use meanwhile
+        self._last_fetch = time.monotonic()
+        url = urlparse(self.jwks_url)
+        try:
+            if url.scheme in ("http", "https"):
+                async with httpx.AsyncClient(timeout=settings.CLERK_TIMEOUT) as client:
+                    response = await client.get(self.jwks_url)
+                    response.raise_for_status()
+                    data = response.json()
+            else:
+                path = Path(url.path if url.scheme == "file" else self.jwks_url)
+                data = json.loads(await asyncio.to_thread(path.read_text))
+            key_set = jwt.PyJWKSet.from_dict(data)
+        except Exception as e:
+            print(f"Error fetching JWKS from {self.jwks_url}: {e}")
+            return
+
+        keys = {}
+        for key in key_set.keys:
+            keys[key.key_id] = key
+        print(f"DEBUG: Loaded {len(keys)} JWKS keys from {self.jwks_url}")
+        self._keys = keys
+
+
+jwks_verifier = (
+    JWKSVerifier(
+        settings.CLERK_JWKS_URL,
+        issuer=settings.CLERK_ISSUER,
+        min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL,
+        leeway=settings.JWT_LEEWAY,
+        cache_size=settings.VERIFIED_TOKEN_CACHE_SIZE,
+    )
+    if settings.CLERK_JWKS_URL
+    else None
+)
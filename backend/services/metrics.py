@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+# Default latency buckets in seconds (upper bounds)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        return [f"{name}{labels} {self.value}"]
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: "_HistogramValue"):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        """Context manager observing the elapsed wall-clock time"""
+        return _Timer(self)
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        prefix = labels[:-1] + "," if labels else "{"
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{prefix}{le}}} {cumulative}")
+        lines.append(f"{name}_sum{labels} {self.sum}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class _Metric:
+    """A named metric, optionally split into children by label values"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        REGISTRY.append(self)
+
+    def labels(self, **labels):
+        """Return the child for these label values (cache it on hot paths)"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            pairs = ",".join(f'{name}="{value}"' for name, value in zip(self.labelnames, key))
+            lines.extend(child.samples(self.name, "{" + pairs + "}" if pairs else ""))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple = LATENCY_BUCKETS, **kwargs):
+        self.buckets = tuple(buckets)
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Request-level metrics (recorded by MetricsMiddleware)
+REQUESTS = Counter("http_requests_total", "HTTP requests served", ("method", "route", "status"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency", ("route",))
+
+# Per-stage latency of the analysis and report pipeline
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Latency of individual request stages", ("stage",))
+
+# LLM resilience (services.resilience)
+LLM_ATTEMPTS = Counter("llm_attempts_total", "LLM call attempts by outcome", ("outcome",))
+LLM_RETRIES = Counter("llm_retries_total", "LLM calls retried after a transient failure")
+LLM_HEDGES = Counter("llm_hedged_requests_total", "Hedged second LLM attempts started")
+LLM_CIRCUIT_OPEN = Gauge("llm_circuit_open", "1 while the LLM circuit breaker is open")
+
+# Payload sizes
+UPLOAD_BYTES = Histogram("upload_size_bytes", "Size of uploaded images", buckets=SIZE_BUCKETS)
+LLM_IMAGE_BYTES = Histogram("llm_image_size_bytes", "Size of normalized images sent to the LLM", buckets=SIZE_BUCKETS)
+PDF_BYTES = Histogram("pdf_size_bytes", "Size of rendered PDF reports", buckets=SIZE_BUCKETS)
+
+
+def stage(name: str) -> _HistogramValue:
+    """Histogram for one pipeline stage; use ``with stage("llm").time():``"""
+    return STAGE_SECONDS.labels(stage=name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests, in-flight requests and latency per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            # Label by route template (not raw path) to keep cardinality bounded
+            route: Optional[object] = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.labels(route=path).observe(time.perf_counter() - start)
+            REQUESTS.labels(method=scope["method"], route=path, status=status_code).inc()
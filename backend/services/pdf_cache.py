@@ -0,0 +1,99 @@
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from config.settings import settings
+
+
+class PDFCache:
+    """Bounded on-disk cache of rendered PDF reports.
+
+    Files are evicted least-recently-used first (by mtime, which is refreshed
+    on every read) once the directory grows past ``max_bytes``. Concurrent
+    requests for the same report share one render.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Return the cached PDF for ``key`` or render (and cache) it once"""
+        pdf_bytes = await asyncio.to_thread(self._read, key)
+        if pdf_bytes is not None:
+            self.hits += 1
+            return pdf_bytes
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._render(key, render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes": self._size,
+            "in_flight": len(self._inflight),
+        }
+
+    async def _render(self, key: str, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        pdf_bytes = await render()
+        await asyncio.to_thread(self._write, key, pdf_bytes)
+        return pdf_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            pdf_bytes = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return pdf_bytes
+
+    def _write(self, key: str, pdf_bytes: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self.directory.glob("*.pdf"))
+
+        # Write to a temp file and rename so readers never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, self._path(key))
+        self._size += len(pdf_bytes)
+
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        files = []
+        for path in self.directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+
+pdf_cache = PDFCache(settings.PDF_CACHE_DIR, settings.PDF_CACHE_MAX_BYTES)
@@ -0,0 +1,252 @@
+from io import BytesIO
+from datetime import date, datetime
+from typing import Iterable, NamedTuple, Optional
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Image, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from PIL import Image as PILImage, ImageOps
+
+# Images are embedded as JPEG at this resolution for their display box
+PRINT_DPI = 150
+IMAGE_BOX = 4 * inch
+SUMMARY_IMAGE_BOX = 2 * inch
+IMAGE_QUALITY = 85
+
+SECTION_MARKERS = ('🔍', '📊', '⚖️', '💡', '🎯')
+FOOTER_TEXT = "<i>This analysis is AI-generated for educational purposes only.</i>"
+
+
+class SummaryItem(NamedTuple):
+    created_at: str
+    analysis_text: str
+    calories: Optional[float]
+    image_path: Optional[str]
+
+
+class IncrementalDocTemplate(BaseDocTemplate):
+    """Single-frame A4 document laid out as flowables arrive.
+
+    ``add`` places flowables on pages right away instead of collecting the
+    whole story first, so only the current page's flowables are held in
+    memory however long the report gets.
+    """
+
+    def __init__(self, buffer, **kwargs):
+        super().__init__(buffer, pagesize=A4, topMargin=0.8*inch, **kwargs)
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='Report', frames=frame, pagesize=self.pagesize)])
+        self._startBuild()
+        self.canv._doctemplate = self
+
+    def add(self, flowables: list):
+        while flowables:
+            self.clean_hanging()
+            self.handle_flowable(flowables)
+
+    def finish(self):
+        del self.canv._doctemplate
+        self._endBuild()
+
+
+class SimplePDFGenerator:
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        self.setup_styles()
+
+    def setup_styles(self):
+        """Setup custom styles with unique names"""
+        self.styles.add(ParagraphStyle(
+            name='CustomTitle',  # Changed from 'Title' to 'CustomTitle'
+            parent=self.styles['Heading1'],
+            fontSize=20,
+            spaceAfter=20,
+            textColor=colors.HexColor('#2C5F60'),
+            alignment=1
+        ))
+
+        self.styles.add(ParagraphStyle(
+            name='CustomSection',  # Changed from 'Section' to 'CustomSection'
+            parent=self.styles['Heading2'],
+            fontSize=14,
+            spaceBefore=15,
+            spaceAfter=8,
+            textColor=colors.HexColor('#5F9EA0')
+        ))
+
+        # Report lines carry their own spacing instead of a Spacer per line
+        self.styles.add(ParagraphStyle(
+            name='CustomBody',
+            parent=self.styles['Normal'],
+            spaceAfter=5
+        ))
+
+        self.styles.add(ParagraphStyle(
+            name='CustomFooter',
+            parent=self.styles['Normal'],
+            spaceBefore=30
+        ))
+
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#5F9EA0')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#B0C4C4')),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ])
+
+    def image_flowables(self, image_data: bytes, box: float = IMAGE_BOX) -> list:
+        """Build the centered image flowables (or an error note) for a report.
+
+        The image is embedded as a JPEG downsampled to PRINT_DPI for its
+        display box; JPEGs that are already small enough are embedded as-is.
+        """
+        story = []
+        try:
+            jpeg, img_width, img_height = self._print_jpeg(image_data, int(box / inch * PRINT_DPI))
+
+            # Fit the longer edge to the box
+            aspect_ratio = img_width / img_height
+            if img_width > img_height:
+                width = box
+                height = box / aspect_ratio
+            else:
+                height = box
+                width = box * aspect_ratio
+
+            img = Image(BytesIO(jpeg), width=width, height=height)
+            img.hAlign = 'CENTER'
+            story.append(img)
+            story.append(Spacer(1, 20))
+
+        except Exception as e:
+            error_para = Paragraph(f"Image processing error: {str(e)}", self.styles['Normal'])
+            story.append(error_para)
+        return story
+
+    @staticmethod
+    def _print_jpeg(image_data: bytes, max_px: int) -> tuple[bytes, int, int]:
+        """Return (jpeg_bytes, width, height) with the longest edge at most max_px"""
+        with PILImage.open(BytesIO(image_data)) as pil_img:
+            if (
+                pil_img.format == 'JPEG'
+                and pil_img.mode == 'RGB'
+                and max(pil_img.size) <= max_px
+                and pil_img.getexif().get(0x0112, 1) == 1
+            ):
+                return image_data, pil_img.width, pil_img.height
+
+            # Decode at reduced scale where the format allows it
+            pil_img.draft('RGB', (max_px, max_px))
+            img = ImageOps.exif_transpose(pil_img)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = PILImage.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail((max_px, max_px), PILImage.LANCZOS)
+
+            buffer = BytesIO()
+            img.save(buffer, format='JPEG', quality=IMAGE_QUALITY, optimize=True)
+            return buffer.getvalue(), img.width, img.height
+
+    def text_flowables(self, analysis_text: str) -> list:
+        """One paragraph per non-empty line; section headings get their own style"""
+        story = []
+        for line in analysis_text.split('\n'):
+            if line.strip():
+                if any(emoji in line for emoji in SECTION_MARKERS):
+                    story.append(Paragraph(line, self.styles['CustomSection']))
+                else:
+                    story.append(Paragraph(line, self.styles['CustomBody']))
+        return story
+
+    def header_flowables(self, title: str, subtitle: str) -> list:
+        return [
+            Paragraph(title, self.styles['CustomTitle']),
+            Spacer(1, 20),
+            Paragraph(subtitle, self.styles['Normal']),
+            Spacer(1, 20),
+        ]
+
+    def create_pdf(
+        self,
+        image_data: Optional[bytes],
+        analysis_text: str,
+        user_email: str,
+        report_date: Optional[datetime] = None,
+    ) -> bytes:
+        """Create PDF with image (if any) and analysis"""
+        buffer = BytesIO()
+        doc = IncrementalDocTemplate(buffer)
+
+        date_str = (report_date or datetime.now()).strftime("%B %d, %Y")
+        doc.add(self.header_flowables(
+            "🍽️ AI Nutrition Analysis Report",
+            f"Generated on {date_str} for {user_email}",
+        ))
+
+        if image_data is not None:
+            doc.add(self.image_flowables(image_data))
+
+        doc.add([Paragraph("📊 Analysis Results", self.styles['CustomSection'])])
+        doc.add(self.text_flowables(analysis_text))
+        doc.add([Paragraph(FOOTER_TEXT, self.styles['CustomFooter'])])
+
+        doc.finish()
+        return buffer.getvalue()
+
+    def create_summary_pdf(
+        self,
+        user_email: str,
+        start: date,
+        end: date,
+        daily_totals: list[tuple],
+        analyses: Iterable[SummaryItem],
+    ) -> bytes:
+        """Create a report covering every analysis between start and end.
+
+        ``daily_totals`` rows are (day, analyses, calories, carbs_g, protein_g,
+        fat_g). ``analyses`` is consumed lazily and each analysis is laid out
+        as soon as it is read, so long reports never hold the whole story.
+        """
+        buffer = BytesIO()
+        doc = IncrementalDocTemplate(buffer)
+
+        period = f"{start.strftime('%B %d')} – {end.strftime('%B %d, %Y')}"
+        doc.add(self.header_flowables(
+            "🍽️ Nutrition Summary",
+            f"{period} for {user_email}",
+        ))
+
+        doc.add([Paragraph("📊 Daily Totals", self.styles['CustomSection'])])
+        if daily_totals:
+            rows = [['Day', 'Analyses', 'Calories', 'Carbs (g)', 'Protein (g)', 'Fat (g)']]
+            for day, count, calories, carbs, protein, fat in daily_totals:
+                rows.append([day, count, f"{calories:.0f}", f"{carbs:.0f}", f"{protein:.0f}", f"{fat:.0f}"])
+            table = Table(rows, hAlign='LEFT')
+            table.setStyle(self.table_style)
+            doc.add([table])
+        else:
+            doc.add([Paragraph("No nutrition data for this period.", self.styles['CustomBody'])])
+
+        for item in analyses:
+            created = datetime.fromisoformat(item.created_at).strftime("%A, %B %d at %H:%M")
+            heading = f"🍽️ {created}"
+            if item.calories is not None:
+                heading += f" — {item.calories:.0f} kcal"
+            doc.add([Paragraph(heading, self.styles['CustomSection'])])
+            if item.image_path is not None:
+                try:
+                    with open(item.image_path, 'rb') as f:
+                        doc.add(self.image_flowables(f.read(), SUMMARY_IMAGE_BOX))
+                except FileNotFoundError:
+                    pass
+            doc.add(self.text_flowables(item.analysis_text))
+
+        doc.add([Paragraph(FOOTER_TEXT, self.styles['CustomFooter'])])
+        doc.finish()
+        return buffer.getvalue()
@@ -1,114 +1,198 @@
-from io import BytesIO
-from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from PIL import Image as PILImage
-import base64
-
-class SimplePDFGenerator:
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.setup_styles()
-    
-    def setup_styles(self):
-        """Setup custom styles with unique names"""
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',  # Changed from 'Title' to 'CustomTitle'
-            parent=self.styles['Heading1'],
-            fontSize=20,
-            spaceAfter=20,
-            textColor=colors.HexColor('#2C5F60'),
-            alignment=1
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CustomSection',  # Changed from 'Section' to 'CustomSection'
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            spaceBefore=15,
-            spaceAfter=8,
-            textColor=colors.HexColor('#5F9EA0')
-        ))
-    
-    def create_pdf(self, image_base64: str, analysis_text: str, user_email: str) -> bytes:
-        """Create PDF with image and analysis"""
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8*inch)
-        story = []
-        
-        # Title - using the custom style name
-        title = Paragraph("🍽️ AI Nutrition Analysis Report", self.styles['CustomTitle'])
-        story.append(title)
-        story.append(Spacer(1, 20))
-        
-        # Date and user
-        date_str = datetime.now().strftime("%B %d, %Y")
-        meta = Paragraph(f"Generated on {date_str} for {user_email}", self.styles['Normal'])
-        story.append(meta)
-        story.append(Spacer(1, 20))
-        
-        # Add image
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Callable, Iterator, Optional
+from config.settings import settings
+from config.database import get_db_connection
+from services.blob_store import thumbnail_store
+from services.pdf_cache import pdf_cache
+from services.metrics import PDF_BYTES, stage
+from services.profiling import memory_tracker, traced_call
+from utils.compression import decompress_text
+
+# Bump when the report layout changes so cached PDFs are not reused
+PDF_LAYOUT_VERSION = "3"
+
+# Analyses read from the database per query while laying out a summary
+SUMMARY_BATCH_SIZE = 50
+
+# ReportLab is only imported by the renderer processes (see get_pdf_generator)
+_generator = None
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_pdf_generator():
+    """Return the process-wide report generator, importing ReportLab on first use"""
+    global _generator
+    if _generator is None:
+        from services.pdf_generator import SimplePDFGenerator
+
+        _generator = SimplePDFGenerator()
+    return _generator
+
+
+def warm_renderer():
+    """Load ReportLab and build the stylesheet (run inside a renderer process)"""
+    get_pdf_generator()
+
+
+def render_pdf(
+    image_data: Optional[bytes],
+    analysis_text: str,
+    user_email: str,
+    report_date: Optional[datetime] = None,
+    image_path: Optional[str] = None,
+) -> bytes:
+    """Render a report (entry point for the renderer processes).
+
+    The image is passed as bytes or, to keep it out of the inter-process
+    pickle, as the path of a stored thumbnail that is read here.
+    """
+    if image_path is not None:
         try:
-            image_data = base64.b64decode(image_base64)
-            img_buffer = BytesIO(image_data)
-            pil_img = PILImage.open(img_buffer)
-            
-            # Resize to fit page
-            max_width = 4 * inch
-            img_width, img_height = pil_img.size
-            aspect_ratio = img_width / img_height
-            
-            if img_width > img_height:
-                width = max_width
-                height = max_width / aspect_ratio
-            else:
-                height = max_width
-                width = max_width * aspect_ratio
-            
-            # Convert to reportlab image
-            img_buffer_new = BytesIO()
-            pil_img.save(img_buffer_new, format='PNG')
-            img_buffer_new.seek(0)
-            
-            img = Image(img_buffer_new, width=width, height=height)
-            img.hAlign = 'CENTER'
-            story.append(img)
-            story.append(Spacer(1, 20))
-            
-        except Exception as e:
-            error_para = Paragraph(f"Image processing error: {str(e)}", self.styles['Normal'])
-            story.append(error_para)
-        
-        # Analysis text - using the custom style name
-        analysis_header = Paragraph("📊 Analysis Results", self.styles['CustomSection'])
-        story.append(analysis_header)
-        
-        # Simple text formatting
-        lines = analysis_text.split('\n')
-        for line in lines:
-            if line.strip():
-                # Simple formatting
-                if any(emoji in line for emoji in ['🔍', '📊', '⚖️', '💡', '🎯']):
-                    para = Paragraph(line, self.styles['CustomSection'])
-                else:
-                    para = Paragraph(line, self.styles['Normal'])
-                story.append(para)
-                story.append(Spacer(1, 5))
-        
-        # Footer
-        story.append(Spacer(1, 30))
-        footer = Paragraph(
-            "<i>This analysis is AI-generated for educational purposes only.</i>", 
-            self.styles['Normal']
+            with open(image_path, "rb") as f:
+                image_data = f.read()
+        except FileNotFoundError:
+            # Evicted since the path was resolved; render without the image
+            pass
+    return get_pdf_generator().create_pdf(image_data, analysis_text, user_email, report_date)
+
+
+def _iter_summary_items(conn, user_id: str, start: date, end: date) -> Iterator[tuple]:
+    """Yield a user's analyses (live and archived) in [start, end] oldest first,
+    in keyset batches"""
+    last = ("", "")
+    while True:
+        rows = conn.execute(
+            """
+            SELECT created_at, id, analysis_result, calories, thumbnail_hash
+            FROM all_analyses
+            WHERE user_id = ? AND created_at >= ? AND created_at < DATE(?, '+1 day')
+              AND (created_at, id) > (?, ?)
+            ORDER BY created_at, id
+            LIMIT ?
+            """,
+            (user_id, start.isoformat(), end.isoformat(), *last, SUMMARY_BATCH_SIZE),
+        ).fetchall()
+        yield from rows
+        if len(rows) < SUMMARY_BATCH_SIZE:
+            return
+        last = rows[-1][:2]
+
+
+def render_summary_pdf(user_id: str, user_email: str, start: date, end: date) -> bytes:
+    """Render a multi-analysis summary (entry point for the renderer processes).
+
+    Analyses are read here, a batch at a time, and laid out as they are read,
+    so neither this process nor the server ever holds the whole report.
+    """
+    from services.pdf_generator import SummaryItem
+
+    conn = get_db_connection()
+    try:
+        daily_totals = conn.execute(
+            """
+            SELECT day, analyses, calories, carbs_g, protein_g, fat_g
+            FROM user_daily_nutrition
+            WHERE user_id = ? AND day BETWEEN ? AND ?
+            ORDER BY day
+            """,
+            (user_id, start.isoformat(), end.isoformat()),
+        ).fetchall()
+
+        def items():
+            for created_at, _, text, calories, thumbnail_hash in _iter_summary_items(conn, user_id, start, end):
+                path = thumbnail_store.find(thumbnail_hash) if thumbnail_hash else None
+                yield SummaryItem(
+                    created_at, decompress_text(text), calories, str(path) if path else None
+                )
+
+        return get_pdf_generator().create_summary_pdf(user_email, start, end, daily_totals, items())
+    finally:
+        conn.close()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def warm_renderers():
+    """Start a renderer process and load ReportLab in it ahead of the first report"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_executor(), warm_renderer)
+
+
+async def _run_in_renderer(kind: str, fn: Callable[..., bytes], *args) -> bytes:
+    """Run fn in the process pool, under tracemalloc while memory tracing is on"""
+    loop = asyncio.get_running_loop()
+    if not memory_tracker.tracing:
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    pdf_bytes, report = await loop.run_in_executor(
+        _get_executor(), traced_call, settings.TRACEMALLOC_FRAMES, 10, fn, *args
+    )
+    memory_tracker.record_worker(kind, report)
+    return pdf_bytes
+
+
+async def render_pdf_async(
+    image_data: Optional[bytes],
+    analysis_text: str,
+    user_email: str,
+    report_date: Optional[datetime] = None,
+    image_path: Optional[str] = None,
+) -> bytes:
+    """Render a report in the process pool so layout never blocks the event loop"""
+    with stage("pdf_render").time():
+        pdf_bytes = await _run_in_renderer(
+            "report", render_pdf, image_data, analysis_text, user_email, report_date, image_path
         )
-        story.append(footer)
-        
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
-
-# Create the generator instance
-pdf_generator = SimplePDFGenerator()
\ No newline at end of file
+    PDF_BYTES.observe(len(pdf_bytes))
+    return pdf_bytes
+
+
+async def render_summary_pdf_async(user_id: str, user_email: str, start: date, end: date) -> bytes:
+    """Render a summary report in the process pool"""
+    with stage("pdf_render").time():
+        pdf_bytes = await _run_in_renderer(
+            "summary", render_summary_pdf, user_id, user_email, start, end
+        )
+    PDF_BYTES.observe(len(pdf_bytes))
+    return pdf_bytes
+
+
+async def get_report_pdf(
+    analysis_id: str,
+    analysis_text: str,
+    user_email: str,
+    created_at: str,
+    thumbnail_hash: Optional[str] = None,
+) -> bytes:
+    """Return the report for a stored analysis, rendering it at most once.
+
+    The analysis thumbnail, if still stored, is included as the report image.
+    """
+    async def render() -> bytes:
+        path = None
+        if thumbnail_hash:
+            path = await asyncio.to_thread(thumbnail_store.find, thumbnail_hash)
+        return await render_pdf_async(
+            None, analysis_text, user_email, datetime.fromisoformat(created_at),
+            image_path=str(path) if path else None,
+        )
+
+    return await pdf_cache.get_or_render(f"{analysis_id}.v{PDF_LAYOUT_VERSION}", render)
+
+
+def shutdown_renderers():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
\ No newline at end of file
@@ -0,0 +1,401 @@
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Optional
+from config.settings import settings
+
+# Profiling endpoints are never counted as profiled requests
+EXCLUDED_PATH_PREFIXES = ("/admin/profile", "/admin/memory")
+
+MAX_STACK_DEPTH = 128
+
+# Leaf frames of threads blocked waiting for work (dropped unless idle=True)
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("connection.py", "wait"),
+}
+
+# Files whose allocations belong to each request path (tracemalloc filters
+# match any frame of the allocation's traceback)
+MEMORY_GROUPS = {
+    "upload": (
+        "*/starlette/formparsers.py", "*/starlette/datastructures.py", "*/python_multipart/*",
+        "*/multipart/*", "*/tempfile.py", "*/routes/analysis.py", "*/utils/body_limit.py",
+        "*/utils/image_processing.py",
+    ),
+    "base64": (
+        "*/base64.py", "*/utils/helpers.py", "*/services/ai_service.py",
+        "*/langchain_core/messages/*", "*/langchain_google_genai/*", "*/google/genai/*",
+    ),
+    "pdf": (
+        "*/services/pdf_service.py", "*/services/pdf_generator.py", "*/services/pdf_cache.py",
+        "*/reportlab/*",
+    ),
+}
+
+_PATH_PREFIXES = sorted(
+    {
+        sysconfig.get_paths()["purelib"] + os.sep,
+        sysconfig.get_paths()["stdlib"] + os.sep,
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep,
+    },
+    key=len,
+    reverse=True,
+)
+
+
+def short_path(filename: str) -> str:
+    """Path relative to site-packages, the stdlib or the backend directory"""
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+    return filename
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for a bounded session.
+
+    Every sample records the stack of each busy thread and, for each profiled
+    request, the chain of coroutines its task is suspended in, so time spent
+    awaiting the LLM, database threads or PDF renderers shows up under the
+    request. A session profiles the next ``requests`` requests (or every
+    request if None) and ends when they have all completed, when ``seconds``
+    have passed or when stopped. Stacks are read from another thread without
+    pausing the event loop, so a coroutine chain can occasionally be sampled
+    mid-switch; that costs accuracy of one sample, never correctness of the app.
+    """
+
+    def __init__(self):
+        self.capturing = False  # read by ProfilingMiddleware on every request
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._tasks: dict[asyncio.Task, dict] = {}
+        self._labels: dict[tuple, str] = {}
+        self._stacks: Counter = Counter()
+        self._session: Optional[dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, requests: Optional[int], seconds: float, interval_ms: float, idle: bool = False) -> dict:
+        """Start a session; raises RuntimeError if one is already running"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profiling session is already running")
+            self._stop.clear()
+            self._tasks.clear()
+            self._stacks = Counter()
+            self._session = {
+                "mode": "requests" if requests else "window",
+                "request_limit": requests,
+                "seconds": seconds,
+                "interval_ms": interval_ms,
+                "idle": idle,
+                "started_at": time.time(),
+                "ended_at": None,
+                "admitted": 0,
+                "completed": 0,
+                "samples": 0,
+            }
+            self.capturing = True
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        print(f"DEBUG: Profiling started: {self._session}")
+        return self.status()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.status()
+
+    def enter(self, scope: dict) -> Optional[asyncio.Task]:
+        """Register the current request task if the session still admits requests"""
+        with self._lock:
+            if not self.capturing:
+                return None
+            session = self._session
+            session["admitted"] += 1
+            if session["request_limit"] and session["admitted"] >= session["request_limit"]:
+                self.capturing = False
+            task = asyncio.current_task()
+            self._tasks[task] = scope
+            return task
+
+    def exit(self, task: asyncio.Task):
+        with self._lock:
+            if self._tasks.pop(task, None) is None:
+                return  # the session ended while the request was running
+            session = self._session
+            session["completed"] += 1
+            if session["request_limit"] and session["completed"] >= session["request_limit"]:
+                self._stop.set()
+
+    def status(self) -> dict:
+        if self._session is None:
+            return {"state": "idle"}
+        with self._lock:
+            session = dict(self._session)
+            session["stacks"] = len(self._stacks)
+        session["state"] = "running" if self.running else "finished"
+        end = session["ended_at"] or time.time()
+        session["elapsed_seconds"] = round(end - session["started_at"], 2)
+        return session
+
+    def collapsed(self) -> str:
+        """Samples of the current or last session as collapsed stacks
+        (``frame;frame;frame count`` lines, for flamegraph.pl or speedscope)"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks)
+
+    def _run(self):
+        session = self._session
+        interval = session["interval_ms"] / 1000
+        deadline = time.monotonic() + session["seconds"]
+        next_sample = time.monotonic()
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                self._sample(session["idle"])
+                next_sample += interval
+                delay = next_sample - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    # Fell behind (e.g. a long GIL hold); don't burst to catch up
+                    next_sample = time.monotonic()
+        finally:
+            with self._lock:
+                self.capturing = False
+                self._tasks.clear()
+                session["ended_at"] = time.time()
+            print(f"DEBUG: Profiling finished: {session['samples']} samples, {len(self._stacks)} stacks")
+
+    def _sample(self, idle: bool):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if not idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(self._label(frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            stack.append(_sanitize(f"thread:{names.get(ident, ident)}"))
+            stacks.append(tuple(reversed(stack)))
+
+        with self._lock:
+            tasks = list(self._tasks.items())
+        for task, scope in tasks:
+            route = scope.get("route")
+            label = _sanitize(f"request:{scope['method']} {getattr(route, 'path', scope['path'])}")
+            stacks.append((label, *self._coroutine_stack(task.get_coro())))
+
+        with self._lock:
+            self._stacks.update(stacks)
+            self._session["samples"] += 1
+
+    def _coroutine_stack(self, coro) -> list[str]:
+        """Frames of a task's suspended coroutine chain, outermost first"""
+        stack = []
+        while coro is not None and len(stack) < MAX_STACK_DEPTH:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            if frame is None:
+                if stack:
+                    # Awaiting a future (run_in_executor, to_thread, a lock...)
+                    stack.append(f"<await {type(coro).__name__}>")
+                break
+            stack.append(self._label(frame.f_code, frame.f_lineno))
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        return stack
+
+    def _label(self, code, lineno: int) -> str:
+        key = (code, lineno)
+        label = self._labels.get(key)
+        if label is None:
+            label = _sanitize(f"{code.co_qualname} ({short_path(code.co_filename)}:{lineno})")
+            self._labels[key] = label
+        return label
+
+
+def _sanitize(label: str) -> str:
+    # ';' separates frames and a line ends a stack in the collapsed format
+    return label.replace(";", ":").replace("\n", " ")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware registering requests with an active profiling session.
+
+    Without a session it costs one attribute check per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not profiler.capturing or scope["type"] != "http" or scope["path"].startswith(EXCLUDED_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        task = profiler.enter(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if task is not None:
+                profiler.exit(task)
+
+
+def _format_stat(stat, key_type: str) -> dict:
+    frame = stat.traceback[-1] if key_type == "traceback" else stat.traceback[0]
+    result = {
+        "location": f"{short_path(frame.filename)}:{frame.lineno}",
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        result["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        result["count_diff"] = stat.count_diff
+    if key_type == "traceback":
+        # Most recent call first
+        result["traceback"] = [
+            f"{short_path(frame.filename)}:{frame.lineno}" for frame in reversed(stat.traceback)
+        ][:10]
+    return result
+
+
+def _group_filters(group: Optional[str]) -> list[tracemalloc.Filter]:
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+    if group is not None:
+        filters.extend(tracemalloc.Filter(True, pattern, all_frames=True) for pattern in MEMORY_GROUPS[group])
+    return filters
+
+
+class MemoryTracker:
+    """tracemalloc snapshots and diffs, kept in memory by label.
+
+    Tracing slows allocations down noticeably and uses memory of its own, so
+    it only runs between ``start`` and ``stop``. PDF renders run in worker
+    processes; while tracing, each render reports its own peak and retained
+    allocations (see traced_call and services.pdf_service).
+    """
+
+    def __init__(self, max_snapshots: int):
+        self.max_snapshots = max_snapshots
+        self.tracing = False  # checked by the PDF renderer before each render
+        self._snapshots: "OrderedDict[str, tuple[float, tracemalloc.Snapshot]]" = OrderedDict()
+        self.worker_reports: deque = deque(maxlen=20)
+
+    def start(self, frames: int) -> dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.tracing = True
+        return self.status()
+
+    def stop(self) -> dict:
+        self.tracing = False
+        self._snapshots.clear()
+        tracemalloc.stop()
+        return self.status()
+
+    def snapshot(self, label: str, group: Optional[str], limit: int) -> dict:
+        """Take and keep a snapshot; returns its largest allocation sites"""
+        if not self.tracing:
+            raise RuntimeError("Memory tracing is not started")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_group_filters(None))
+        self._snapshots[label] = (time.time(), snapshot)
+        self._snapshots.move_to_end(label)
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+
+        stats = snapshot.filter_traces(_group_filters(group)).statistics("lineno")
+        return {
+            "label": label,
+            "group": group,
+            "total_kb": round(sum(stat.size for stat in stats) / 1024, 1),
+            "top": [_format_stat(stat, "lineno") for stat in stats[:limit]],
+        }
+
+    def diff(self, base: str, target: Optional[str], group: Optional[str], key_type: str, limit: int) -> dict:
+        """Allocation growth from snapshot ``base`` to ``target`` (or now).
+
+        Raises KeyError for an unknown label.
+        """
+        if not self.tracing:
+            raise RuntimeError("Memory tracing is not started")
+        base_snapshot = self._snapshots[base][1]
+        if target is None:
+            target_snapshot = tracemalloc.take_snapshot()
+        else:
+            target_snapshot = self._snapshots[target][1]
+
+        filters = _group_filters(group)
+        stats = target_snapshot.filter_traces(filters).compare_to(
+            base_snapshot.filter_traces(filters), key_type
+        )
+        return {
+            "base": base,
+            "target": target or "now",
+            "group": group,
+            "size_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            "top": [_format_stat(stat, key_type) for stat in stats[:limit]],
+        }
+
+    def record_worker(self, kind: str, report: dict):
+        self.worker_reports.append({"kind": kind, "at": time.time(), **report})
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "overhead_kb": round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+            "snapshots": [
+                {"label": label, "taken_at": taken_at, "traces": len(snapshot.traces)}
+                for label, (taken_at, snapshot) in self._snapshots.items()
+            ],
+            "pdf_workers": list(self.worker_reports),
+        }
+
+
+def traced_call(frames: int, limit: int, fn: Callable, *args):
+    """Run ``fn(*args)`` under tracemalloc in a worker process.
+
+    Returns the result and a report of the peak traced memory and the
+    allocation sites still alive when ``fn`` returned.
+    """
+    tracemalloc.start(frames)
+    try:
+        result = fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().filter_traces(_group_filters(None)).statistics("lineno")
+    finally:
+        tracemalloc.stop()
+    return result, {
+        "pid": os.getpid(),
+        "peak_kb": round(peak / 1024, 1),
+        "retained": [_format_stat(stat, "lineno") for stat in stats[:limit]],
+    }
+
+
+profiler = SamplingProfiler()
+memory_tracker = MemoryTracker(settings.MEMORY_MAX_SNAPSHOTS)
@@ -1,52 +1,79 @@
 from datetime import datetime
-from config.database import get_db_connection
+from config.database import db_connection
 from config.settings import settings
+from services.metrics import stage
+from services.response_cache import response_cache
 
-def check_rate_limit(user_id: str, email: str) -> tuple[bool, int]:
-    """Check if user has exceeded daily rate limit"""
+# Check-and-increment in a single statement: SQLite serializes writers, so
+# concurrent requests (across threads and uvicorn workers sharing the file)
+# can never push daily_requests past the limit. No row is returned when the
+# reservation would exceed the limit.
+RESERVE_SQL = """
+    INSERT INTO user_usage (user_id, email, daily_requests, last_request_date, total_requests)
+    VALUES (:user_id, :email, :count, :today, :count)
+    ON CONFLICT(user_id) DO UPDATE SET
+        daily_requests = CASE
+            WHEN last_request_date = :today THEN daily_requests + :count
+            ELSE :count
+        END,
+        last_request_date = :today,
+        total_requests = total_requests + :count
+    WHERE (CASE WHEN last_request_date = :today THEN daily_requests ELSE 0 END) + :count <= :limit
+    RETURNING daily_requests
+"""
+
+REFUND_SQL = """
+    UPDATE user_usage
+    SET daily_requests = MAX(daily_requests - :count, 0),
+        total_requests = MAX(total_requests - :count, 0)
+    WHERE user_id = :user_id AND last_request_date = :today
+"""
+
+
+def reserve_requests(user_id: str, email: str, count: int = 1) -> tuple[bool, int]:
+    """Atomically reserve ``count`` requests from the user's daily quota.
+
+    Either all requested slots are reserved or none are. Returns whether the
+    reservation succeeded and the number of requests remaining today.
+    """
     # Admin has unlimited access
     if user_id == settings.ADMIN_USER_ID:
         return True, 999
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if count > settings.DAILY_LIMIT:
+        return False, 0
+
+    with stage("rate_limit").time(), db_connection() as conn:
+        row = conn.execute(
+            RESERVE_SQL,
+            {
+                "user_id": user_id,
+                "email": email,
+                "count": count,
+                "today": str(datetime.now().date()),
+                "limit": settings.DAILY_LIMIT,
+            },
+        ).fetchone()
 
-    today = datetime.now().date()
+    if row is None:
+        return False, 0
+    response_cache.invalidate(user_id)
+    return True, settings.DAILY_LIMIT - row[0]
 
-    # Get or create user usage record
-    cursor.execute(
-        "SELECT daily_requests, last_request_date FROM user_usage WHERE user_id = ?",
-        (user_id,),
-    )
-    result = cursor.fetchone()
 
-    if not result:
-        # Create new user record
-        cursor.execute(
-            "INSERT INTO user_usage (user_id, email, daily_requests, last_request_date) VALUES (?, ?, 0, ?)",
-            (user_id, email, str(today)),
-        )
-        daily_requests = 0
-        last_request_date = str(today)
-    else:
-        daily_requests, last_request_date = result
+def refund_requests(user_id: str, count: int = 1):
+    """Give back reserved requests whose analysis failed"""
+    if user_id == settings.ADMIN_USER_ID or count <= 0:
+        return
 
-    # Reset counter if it's a new day
-    if last_request_date != str(today):
-        daily_requests = 0
+    with stage("rate_limit_refund").time(), db_connection() as conn:
+        conn.execute(
+            REFUND_SQL,
+            {"user_id": user_id, "count": count, "today": str(datetime.now().date())},
+        )
+    response_cache.invalidate(user_id)
 
-    if daily_requests >= settings.DAILY_LIMIT:
-        conn.close()
-        return False, 0
 
-    # Increment counter
-    new_count = daily_requests + 1
-    cursor.execute(
-        "UPDATE user_usage SET daily_requests = ?, last_request_date = ?, total_requests = total_requests + 1 WHERE user_id = ?",
-        (new_count, str(today), user_id),
-    )
-    conn.commit()
-    conn.close()
-
-    remaining = settings.DAILY_LIMIT - new_count
-    return True, remaining
\ No newline at end of file
+def check_rate_limit(user_id: str, email: str) -> tuple[bool, int]:
+    """Check if user has exceeded daily rate limit (reserves one request)"""
+    return reserve_requests(user_id, email, 1)
@@ -0,0 +1,275 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+import httpx
+from services.metrics import LLM_ATTEMPTS, LLM_CIRCUIT_OPEN, LLM_HEDGES, LLM_RETRIES
+
+T = TypeVar("T")
+
+# Upstream status codes worth retrying (timeouts, throttling, server errors)
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is failing"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open; retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(TimeoutError):
+    """The overall deadline passed before any attempt succeeded"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an upstream error is transient (timeouts, connection errors,
+    throttling and 5xx). Wrapped errors are classified by their cause."""
+    while error is not None:
+        if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        if isinstance(code, int):
+            return code in RETRYABLE_STATUS_CODES
+        error = error.__cause__
+    return False
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast with CircuitOpenError for ``reset_timeout`` seconds. Then one
+    trial call is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self):
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return
+        self.rejected += 1
+        retry_after = max(self.reset_timeout - (time.monotonic() - self.opened_at), 1.0)
+        raise CircuitOpenError(retry_after)
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_running = False
+        if self.opened_at is not None:
+            print("LLM circuit closed")
+            self.opened_at = None
+            LLM_CIRCUIT_OPEN.set(0)
+
+    def release(self):
+        """Give up a half-open trial that ended without an outcome (cancelled)"""
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        was_trial = self._trial_running
+        self._trial_running = False
+        if was_trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+            print(f"LLM circuit opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+            LLM_CIRCUIT_OPEN.set(1)
+
+
+class ResilientCaller:
+    """Deadlines, jittered retries, a circuit breaker and optional hedging
+    around calls to one upstream.
+
+    Each attempt gets ``attempt_timeout`` seconds and all attempts together
+    ``total_timeout``. Retryable failures are retried up to ``max_attempts``
+    times with full-jitter exponential backoff. With ``hedge`` enabled, a
+    second attempt is started when the first has run longer than the recent
+    ``hedge_percentile`` latency, and whichever finishes first wins.
+    """
+
+    def __init__(
+        self,
+        attempt_timeout: float,
+        total_timeout: float,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        breaker: CircuitBreaker,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 1.0,
+        hedge_min_samples: int = 20,
+    ):
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies: deque = deque(maxlen=200)
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run ``attempt()`` (a fresh coroutine per call) under the policy"""
+        deadline = time.monotonic() + self.total_timeout
+        for number in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+            try:
+                if timeout <= 0:
+                    raise DeadlineExceededError("LLM deadline exceeded")
+                result = await self._attempt(attempt, timeout)
+            except Exception as e:
+                await self._handle_failure(e, number, deadline)
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                LLM_ATTEMPTS.labels(outcome="success").inc()
+                return result
+
+    async def stream(self, attempt: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Stream ``attempt()`` under the policy.
+
+        Attempts are retried only until the first chunk arrives; after that a
+        failure is raised to the caller. Hedging does not apply to streams.
+        """
+        deadline = time.monotonic() + self.total_timeout
+        for number in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            chunks = attempt()
+            try:
+                timeout = min(self.attempt_timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    raise DeadlineExceededError("LLM deadline exceeded")
+                first = await asyncio.wait_for(anext(chunks), timeout)
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                return
+            except Exception as e:
+                await chunks.aclose()
+                await self._handle_failure(e, number, deadline)
+                continue
+            except BaseException:
+                self.breaker.release()
+                await chunks.aclose()
+                raise
+            break
+
+        try:
+            yield first
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceededError("LLM deadline exceeded")
+                try:
+                    chunk = await asyncio.wait_for(anext(chunks), remaining)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            LLM_ATTEMPTS.labels(outcome="error").inc()
+            raise
+        except BaseException:
+            # Closed early by the consumer
+            self.breaker.release()
+            raise
+        finally:
+            await chunks.aclose()
+        self.breaker.record_success()
+        LLM_ATTEMPTS.labels(outcome="success").inc()
+
+    async def _handle_failure(self, error: Exception, number: int, deadline: float):
+        """Record a failed attempt and sleep before the next one, or re-raise"""
+        retryable = is_retryable(error)
+        LLM_ATTEMPTS.labels(outcome="timeout" if isinstance(error, TimeoutError) else "error").inc()
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # The upstream answered; the request itself was bad
+            self.breaker.record_success()
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (number - 1)))
+        if not retryable or number >= self.max_attempts or time.monotonic() + delay >= deadline:
+            raise error
+        print(f"LLM attempt {number} failed ({error!r}); retrying in {delay:.2f}s")
+        LLM_RETRIES.inc()
+        await asyncio.sleep(delay)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged attempt, or None when hedging is off"""
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(int(len(ordered) * self.hedge_percentile), len(ordered) - 1)
+        return max(ordered[index], self.hedge_min_delay)
+
+    async def _timed(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        result = await attempt()
+        self._latencies.append(time.monotonic() - start)
+        return result
+
+    async def _attempt(self, attempt: Callable[[], Awaitable[T]], timeout: float) -> T:
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout or self.breaker.state != "closed":
+            return await asyncio.wait_for(self._timed(attempt), timeout)
+
+        tasks = {asyncio.ensure_future(self._timed(attempt))}
+        try:
+            async with asyncio.timeout(timeout):
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    LLM_HEDGES.inc()
+                    tasks.add(asyncio.ensure_future(self._timed(attempt)))
+                error = None
+                while tasks:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.cancelled():
+                            continue
+                        if task.exception() is None:
+                            return task.result()
+                        error = task.exception()
+                # Every attempt was cancelled from outside: propagate that
+                raise error or asyncio.CancelledError()
+        finally:
+            # Cancel the losing (or timed out) attempt
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay()
+        return {
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "rejected_calls": self.breaker.rejected,
+            "hedging": self.hedge,
+            "hedge_delay_seconds": round(delay, 3) if delay is not None else None,
+            "latency_samples": len(self._latencies),
+        }
@@ -0,0 +1,149 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import NamedTuple, Optional
+from fastapi import Request, Response
+from config.settings import settings
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: float
+    expires_at: float
+
+
+def make_entry(body: bytes, ttl: float, previous: Optional[CachedResponse] = None) -> CachedResponse:
+    """Wrap a serialized JSON body with its validators.
+
+    The ETag is weak because GZipMiddleware may serve the same entry gzipped
+    or not. If ``previous`` (the entry being replaced) has the same body, its
+    Last-Modified is kept, so refilling an expired entry does not look like a
+    change to If-Modified-Since clients.
+    """
+    now = time.time()
+    etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    last_modified = previous.last_modified if previous is not None and previous.etag == etag else now
+    return CachedResponse(body, etag, last_modified, now + ttl)
+
+
+class ResponseCache:
+    """In-process cache of serialized per-user GET responses.
+
+    Entries are dropped when the user's state changes (``invalidate`` is
+    called by the rate limiter and when analyses are saved) and expire after
+    ``ttl`` seconds otherwise, which bounds staleness for changes made by
+    other worker processes. A response computed while an invalidation
+    happened is not stored (see ``token``).
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, str], CachedResponse]" = OrderedDict()
+        self._keys_by_user: dict[str, set[str]] = {}
+        self._invalidated_at: dict[str, int] = {}
+        self._counter = itertools.count(1)
+        self._last = 0
+        self._floor = 0  # responses computed before this token are never stored
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def token(self) -> int:
+        """Take before computing a response; pass to ``put``"""
+        return self._last
+
+    def get(self, user_id: str, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None or entry.expires_at <= time.time():
+                self.misses += 1
+                return None
+            self._entries.move_to_end((user_id, key))
+            self.hits += 1
+            return entry
+
+    def put(self, user_id: str, key: str, body: bytes, token: int) -> CachedResponse:
+        """Cache ``body`` unless the user's state changed after ``token``"""
+        with self._lock:
+            entry = make_entry(body, self.ttl, self._entries.get((user_id, key)))
+            if token < self._floor or self._invalidated_at.get(user_id, 0) > token:
+                return entry
+            self._entries[(user_id, key)] = entry
+            self._entries.move_to_end((user_id, key))
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                (old_user, old_key), _ = self._entries.popitem(last=False)
+                self._forget_key(old_user, old_key)
+        return entry
+
+    def invalidate(self, user_id: str):
+        """Drop the user's cached responses (safe to call from any thread)"""
+        with self._lock:
+            self._last = next(self._counter)
+            self._invalidated_at[user_id] = self._last
+            for key in self._keys_by_user.pop(user_id, ()):
+                self._entries.pop((user_id, key), None)
+            self.invalidations += 1
+            if len(self._invalidated_at) > self.max_entries:
+                # Start over rather than track invalidations for every user
+                self._floor = self._last
+                self._invalidated_at.clear()
+                self._entries.clear()
+                self._keys_by_user.clear()
+
+    def _forget_key(self, user_id: str, key: str):
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+def _not_modified(request: Request, entry: CachedResponse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Takes precedence over If-Modified-Since; compared weakly (RFC 9110 13.1.2)
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.last_modified) <= since
+    return False
+
+
+def conditional_response(request: Request, entry: CachedResponse) -> Response:
+    """Serve a cached JSON body, or 304 if the client's copy is current.
+
+    ``no-cache`` makes clients revalidate every poll, which the validators
+    turn into an empty 304 when nothing changed.
+    """
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_TTL, settings.RESPONSE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,191 @@
+import argparse
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Optional
+from config.database import get_db_connection, init_db
+from utils.compression import decompress_text
+
+REBUILD_BATCH_SIZE = 1000
+
+# Live and archived analyses, each read in the order of its
+# (user_id, created_at, id) index; live first, so rows archived during a
+# rebuild are picked up from the archive
+REBUILD_TABLES = ("analyses", "analyses_archive")
+
+# Skips analyses indexed by save_analyses while a rebuild is running
+UNINDEXED = "NOT EXISTS (SELECT 1 FROM analyses_fts_map m WHERE m.analysis_id = {table}.id)"
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def owner_tag(user_id: str) -> str:
+    """Fixed-length alphanumeric prefix of every term indexed for a user"""
+    return hashlib.sha256(user_id.encode()).hexdigest()[:16]
+
+
+def normalize_word(word: str, stem: bool = True) -> str:
+    """Lowercase, strip accents and reduce plurals (Harman's S stemmer)"""
+    word = unicodedata.normalize("NFKD", word.lower())
+    word = "".join(c for c in word if not unicodedata.combining(c))
+    if stem and len(word) > 3:
+        if word.endswith("ies") and not word.endswith(("eies", "aies")):
+            return word[:-3] + "y"
+        if word.endswith("es") and not word.endswith(("aes", "ees", "oes")):
+            return word[:-1]
+        if word.endswith("s") and not word.endswith(("us", "ss")):
+            return word[:-1]
+    return word
+
+
+def index_terms(user_id: str, text: str) -> str:
+    """The text as FTS5 input: one owner-prefixed term per word.
+
+    Prefixing every term with the owner's tag gives each user their own
+    terms, so a query only reads (and BM25 only counts) that user's
+    analyses however many other users mention the same words.
+    """
+    tag = owner_tag(user_id)
+    return " ".join(tag + normalize_word(word) for word in WORD_PATTERN.findall(text))
+
+
+def build_match(user_id: str, query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query over one user's analyses.
+
+    Every word must match; a trailing ``*`` matches by prefix. FTS5 syntax
+    typed by the user is treated as plain words. Returns None if the query
+    has no words.
+    """
+    tag = owner_tag(user_id)
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        words = WORD_PATTERN.findall(word)
+        for i, part in enumerate(words):
+            if prefix and i == len(words) - 1:
+                terms.append(f'"{tag}{normalize_word(part, stem=False)}"*')
+            else:
+                terms.append(f'"{tag}{normalize_word(part)}"')
+    return " AND ".join(terms) or None
+
+
+def index_analyses(conn: sqlite3.Connection, analyses: list[tuple[str, str, str]]):
+    """Add (analysis_id, user_id, analysis_text) rows to the search index"""
+    for analysis_id, user_id, text in analyses:
+        rowid = conn.execute(
+            "INSERT INTO analyses_fts_map (analysis_id) VALUES (?)", (analysis_id,)
+        ).lastrowid
+        conn.execute(
+            "INSERT INTO analyses_fts (rowid, terms) VALUES (?, ?)",
+            (rowid, index_terms(user_id, text)),
+        )
+
+
+def search_analyses(
+    conn: sqlite3.Connection, user_id: str, query: str, limit: int, offset: int
+) -> list[tuple]:
+    """Best matching analyses of user_id as (id, preview, created_at, thumbnail_hash)
+
+    Matches are ranked with BM25, with term statistics taken over the
+    user's own analyses.
+    """
+    match = build_match(user_id, query)
+    if match is None:
+        return []
+    ids = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT m.analysis_id
+            FROM analyses_fts f
+            JOIN analyses_fts_map m ON m.id = f.rowid
+            WHERE analyses_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            (match, limit, offset),
+        )
+    ]
+    if not ids:
+        return []
+
+    rows = conn.execute(
+        f"""
+        SELECT id, preview, created_at, thumbnail_hash FROM all_analyses
+        WHERE id IN ({", ".join("?" * len(ids))}) AND user_id = ?
+        """,
+        (*ids, user_id),
+    ).fetchall()
+    by_id = {row[0]: row for row in rows}
+    return [by_id[analysis_id] for analysis_id in ids if analysis_id in by_id]
+
+
+def rebuild() -> dict:
+    """Re-index every live and archived analysis from scratch.
+
+    Searches return partial results until the rebuild finishes.
+    """
+    start = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute("INSERT INTO analyses_fts (analyses_fts) VALUES ('delete-all')")
+            conn.execute("DELETE FROM analyses_fts_map")
+
+        indexed = sum(_index_table(conn, table) for table in REBUILD_TABLES)
+
+        with conn:
+            conn.execute("INSERT INTO analyses_fts (analyses_fts) VALUES ('optimize')")
+    finally:
+        conn.close()
+    return {"indexed": indexed, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def _index_table(conn: sqlite3.Connection, table: str) -> int:
+    """Index the not yet indexed analyses of one table, in batches"""
+    unindexed = UNINDEXED.format(table=table)
+    indexed = 0
+    after = None
+    while True:
+        if after is None:
+            rows = conn.execute(
+                f"""
+                SELECT user_id, created_at, id, analysis_result FROM {table}
+                WHERE {unindexed}
+                ORDER BY user_id, created_at, id
+                LIMIT ?
+                """,
+                (REBUILD_BATCH_SIZE,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"""
+                SELECT user_id, created_at, id, analysis_result FROM {table}
+                WHERE (user_id, created_at, id) > (?, ?, ?) AND {unindexed}
+                ORDER BY user_id, created_at, id
+                LIMIT ?
+                """,
+                (*after, REBUILD_BATCH_SIZE),
+            ).fetchall()
+        if not rows:
+            return indexed
+        with conn:
+            index_analyses(conn, [
+                (analysis_id, user_id, decompress_text(text) or "")
+                for user_id, _, analysis_id, text in rows
+            ])
+        indexed += len(rows)
+        after = rows[-1][:3]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the analysis search index")
+    parser.add_argument("--rebuild", action="store_true", help="re-index all analyses")
+    args = parser.parse_args()
+    if args.rebuild:
+        init_db()
+        print(rebuild())
+    else:
+        parser.print_help()
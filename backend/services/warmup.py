@@ -0,0 +1,45 @@
+import asyncio
+import importlib
+import time
+
+# Components reported by /ready; each is marked warm once loaded
+components: dict[str, bool] = {
+    "database": False,
+    "llm": False,
+    "image": False,
+    "pdf": False,
+}
+
+
+def mark_warm(name: str):
+    components[name] = True
+
+
+def is_ready() -> bool:
+    return all(components.values())
+
+
+async def _warm(name: str, load):
+    start = time.perf_counter()
+    try:
+        await load()
+    except Exception as e:
+        # Leave the component cold; it is loaded again on first use
+        print(f"Warm-up of {name} failed: {e}")
+        return
+    mark_warm(name)
+    print(f"DEBUG: Warmed {name} in {time.perf_counter() - start:.2f}s")
+
+
+async def warm_up():
+    """Load the heavy components in the background after startup.
+
+    Everything here is also loaded lazily on first use, so requests served
+    before warm-up finishes still work, only slower.
+    """
+    from services.ai_service import get_llm
+    from services.pdf_service import warm_renderers
+
+    await _warm("llm", lambda: asyncio.to_thread(get_llm))
+    await _warm("image", lambda: asyncio.to_thread(importlib.import_module, "PIL.ImageOps"))
+    await _warm("pdf", warm_renderers)
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+
+from services.clerk_client import ClerkUserCache
+
+
+def make_cache(handler) -> ClerkUserCache:
+    cache = ClerkUserCache(ttl=60, negative_ttl=30, stale_ttl=300, max_entries=10)
+    cache._client = httpx.AsyncClient(
+        base_url="https://clerk.test", transport=httpx.MockTransport(handler)
+    )
+    return cache
+
+
+def test_non_json_body_is_negative_cached():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, text="<html>bad gateway</html>")
+
+    async def run():
+        cache = make_cache(handler)
+        first = await cache.get_email("user_1")
+        second = await cache.get_email("user_1")
+        await cache.close()
+        return cache, first, second
+
+    cache, first, second = asyncio.run(run())
+    assert first is None and second is None
+    assert len(calls) == 1
+    assert cache.upstream_errors == 1
+
+
+def test_malformed_payload_keeps_serving_stale_email():
+    def handler(request):
+        return httpx.Response(200, json={"email_addresses": ["not-an-object"]})
+
+    async def run():
+        cache = make_cache(handler)
+        # Past its TTL but inside the stale window
+        cache._store("user_1", "old@example.com")
+        cache._entries["user_1"] = (time.monotonic() - 120, "old@example.com")
+
+        stale = await cache.get_email("user_1")
+        refresh = cache._inflight.get("user_1")
+        refreshed = await refresh
+        await cache.close()
+        return cache, stale, refresh, refreshed
+
+    cache, stale, refresh, refreshed = asyncio.run(run())
+    assert stale == "old@example.com"
+    assert refresh.exception() is None
+    assert refreshed == "old@example.com"
+    assert cache.upstream_errors == 1
@@ -0,0 +1,42 @@
+import fnmatch
+
+import pytest
+
+from services.profiling import MEMORY_GROUPS, MemoryTracker
+from utils.helpers import encode_image
+
+
+@pytest.fixture
+def tracker():
+    tracker = MemoryTracker(max_snapshots=2)
+    tracker.start(frames=10)
+    yield tracker
+    tracker.stop()
+
+
+def test_base64_group_contains_encode_image_allocations(tracker):
+    tracker.snapshot("base", group=None, limit=1)
+    encoded = encode_image(b"\xff" * 1_000_000)
+
+    diff = tracker.diff("base", None, "base64", "lineno", limit=5)
+
+    assert len(encoded) > 1_300_000
+    top = diff["top"][0]
+    assert top["location"].startswith("utils/helpers.py:")
+    assert top["size_diff_kb"] >= 1_300
+
+
+@pytest.mark.parametrize("module", ["langchain_google_genai", "google.genai"])
+def test_base64_group_matches_gemini_client(module):
+    path = pytest.importorskip(module).__file__
+    assert any(fnmatch.fnmatch(path, pattern) for pattern in MEMORY_GROUPS["base64"])
+
+
+def test_groups_exclude_unrelated_allocations(tracker):
+    tracker.snapshot("base", group=None, limit=1)
+    data = [bytes(1000) for _ in range(1000)]
+
+    diff = tracker.diff("base", None, "base64", "lineno", limit=5)
+
+    assert len(data) == 1000
+    assert all(not stat["location"].startswith("tests/") for stat in diff["top"])
@@ -0,0 +1,22 @@
+from services import response_cache as rc
+from services.response_cache import ResponseCache
+
+
+def test_refill_with_same_body_keeps_last_modified(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rc.time, "time", lambda: now[0])
+    cache = ResponseCache(ttl=60, max_entries=10)
+
+    first = cache.put("user_1", "profile", b'{"a":1}', cache.token())
+    now[0] += 120
+    assert cache.get("user_1", "profile") is None
+
+    refilled = cache.put("user_1", "profile", b'{"a":1}', cache.token())
+    assert refilled.etag == first.etag
+    assert refilled.last_modified == first.last_modified
+    assert refilled.expires_at == now[0] + 60
+
+    now[0] += 120
+    changed = cache.put("user_1", "profile", b'{"a":2}', cache.token())
+    assert changed.etag != first.etag
+    assert changed.last_modified == now[0]
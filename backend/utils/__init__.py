@@ -1 +1 @@
-from .helpers import encode_image, validate_file_type, validate_file_size
\ No newline at end of file
+from .helpers import encode_image, validate_file_type, validate_file_size, make_preview
\ No newline at end of file
@@ -0,0 +1,59 @@
+from starlette.exceptions import HTTPException
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware capping the size of request bodies.
+
+    Requests whose Content-Length exceeds the limit are rejected before the
+    body is read; chunked bodies are counted while they stream in and aborted
+    with 413 as soon as they pass the limit, so an oversized upload is never
+    spooled in full. ``path_limits`` overrides the limit for specific paths.
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: dict[str, int] | None = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the body parser, so the app's exception
+                    # handling turns it into the response
+                    raise HTTPException(status_code=413, detail=self._detail(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _detail(limit: int) -> str:
+        return f"Request body too large. Maximum size is {limit // 1_000_000}MB."
+
+    async def _reject(self, send, limit: int):
+        body = ('{"detail":"%s"}' % self._detail(limit)).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
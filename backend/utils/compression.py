@@ -0,0 +1,66 @@
+import zlib
+from typing import Optional, Union
+
+# Stored values start with MAGIC and a dictionary version byte, followed by a
+# raw deflate stream primed with that dictionary. Anything else is plain text
+# (rows written before compression, or too short to benefit from it).
+MAGIC = b"\x1fZ"
+
+# Preset dictionaries, by version. zlib primes its window with the dictionary,
+# so phrases shared by most reports (the section headings and bullet labels
+# requested in services.ai_service.ANALYSIS_PROMPT, and the JSON nutrition
+# block) are encoded as back-references even in the first report bytes.
+# Phrases used most often go last, closest to the data. Never edit a
+# published dictionary: add a new version and point DEFAULT_VERSION at it.
+DICTIONARIES = {
+    1: (
+        "Based on the image, this appears to be a serving of . The portion size "
+        "is estimated at approximately grams (about 1 cup). This meal provides a "
+        "good source of protein, healthy fats and complex carbohydrates, "
+        "vitamins and minerals such as vitamin A, vitamin C, vitamin K, iron, "
+        "potassium, calcium and magnesium. It is relatively high in sodium and "
+        "saturated fat. Consider adding more vegetables, whole grains or a side "
+        "salad for fiber. Contains gluten, dairy, eggs, nuts, soy. "
+        "Rating: /10 - Overall, this is a balanced and nutritious meal.\n"
+        "- **Estimated Portion Size:** \n- **Total Estimated Calories:** "
+        "approximately  kcal\n- **Carbohydrates:** g\n- **Protein:** g\n"
+        "- **Fat:** g\n- **Fiber:** g\n- **Sugar:** g\n"
+        "- **Key Vitamins and Minerals:** \n"
+        "- **Overall Nutritional Quality:** \n- **Health Benefits:** \n"
+        "- **Concerns:** \n- **Allergen Information:** \n"
+        "- **Suggestions for Nutritional Balance:** \n"
+        "- **Complementary Foods:** \n- **Portion Recommendations:** \n"
+        "- **Key Nutritional Highlights:** \n- **Main Takeaway:** \n"
+        "🔍 **FOOD IDENTIFICATION**\n\n"
+        "📊 **NUTRITIONAL BREAKDOWN**\n\n"
+        "⚖️ **HEALTH ASSESSMENT**\n\n"
+        "💡 **RECOMMENDATIONS**\n\n"
+        "🎯 **SUMMARY**\n\n"
+        '```json\n{"calories": , "carbs_g": , "protein_g": , "fat_g": , '
+        '"fiber_g": , "sugar_g": , "quality_score": }\n```'
+    ).encode(),
+}
+DEFAULT_VERSION = 1
+
+# Shorter texts are stored as-is
+MIN_COMPRESS_LENGTH = 64
+
+
+def compress_text(text: str, version: int = DEFAULT_VERSION) -> Union[str, bytes]:
+    """Compress ``text`` for storage, or return it unchanged if that is smaller"""
+    data = text.encode()
+    if len(data) < MIN_COMPRESS_LENGTH:
+        return text
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=DICTIONARIES[version])
+    compressed = MAGIC + bytes([version]) + compressor.compress(data) + compressor.flush()
+    return compressed if len(compressed) < len(data) else text
+
+
+def decompress_text(value: Union[str, bytes, None]) -> Optional[str]:
+    """Decode a value stored by compress_text (plain text passes through)"""
+    if value is None or isinstance(value, str):
+        return value
+    if value[:2] != MAGIC:
+        return value.decode()
+    decompressor = zlib.decompressobj(-15, zdict=DICTIONARIES[value[2]])
+    return (decompressor.decompress(value[3:]) + decompressor.flush()).decode()
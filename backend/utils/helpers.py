@@ -1,9 +1,28 @@
-import base64
+import binascii
+import re
 
+PREVIEW_LENGTH = 150
 
-def encode_image(image_content: bytes) -> str:
-    """Encode image content to base64"""
-    return base64.b64encode(image_content).decode()
+# Input bytes per base64 chunk (a multiple of 3, so chunks concatenate cleanly)
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def encode_image(image_content: bytes, prefix: str = "") -> str:
+    """Encode image content to base64, after ``prefix`` (e.g. a data URL header).
+
+    The output is written in chunks into one preallocated buffer, so apart
+    from the returned str no image-sized copy is made.
+    """
+    head = prefix.encode("ascii")
+    buffer = bytearray(len(head) + 4 * ((len(image_content) + 2) // 3))
+    buffer[:len(head)] = head
+    position = len(head)
+    view = memoryview(image_content)
+    for start in range(0, len(image_content), ENCODE_CHUNK_SIZE):
+        encoded = binascii.b2a_base64(view[start:start + ENCODE_CHUNK_SIZE], newline=False)
+        buffer[position:position + len(encoded)] = encoded
+        position += len(encoded)
+    return buffer.decode("ascii")
 
 
 def validate_file_type(content_type: str) -> bool:
@@ -18,3 +37,12 @@ def validate_file_size(file_size: int) -> bool:
     from config.settings import settings
 
     return file_size <= settings.MAX_FILE_SIZE
+
+
+def make_preview(analysis_result: str) -> str:
+    """Build the short plain-text preview shown in the analysis history"""
+    text = re.sub(r"[*#_`]+", "", analysis_result)
+    text = " ".join(text.split())
+    if len(text) <= PREVIEW_LENGTH:
+        return text
+    return text[:PREVIEW_LENGTH].rstrip() + "…"
@@ -0,0 +1,127 @@
+from io import BytesIO
+from typing import BinaryIO, NamedTuple
+from config.settings import settings
+
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# Leading bytes of the upload formats we accept
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "JPEG",
+    b"\x89PNG\r\n\x1a\n": "PNG",
+}
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    detail: str
+
+
+class ImageInfo(NamedTuple):
+    format: str
+    mime_type: str
+    width: int
+    height: int
+
+
+def inspect_image(fp: BinaryIO) -> ImageInfo:
+    """Identify an uploaded image from its header without decoding the pixels.
+
+    Checks the magic bytes, then lets Pillow parse only the header of that
+    format to read the dimensions. Raises ValueError (with a message fit for
+    the client) for unsupported formats, unreadable headers and images with
+    more than ``IMAGE_MAX_PIXELS`` pixels. Leaves ``fp`` at an arbitrary
+    position.
+    """
+    fp.seek(0)
+    head = fp.read(8)
+    image_format = next(
+        (fmt for signature, fmt in IMAGE_SIGNATURES.items() if head.startswith(signature)),
+        None,
+    )
+    if image_format is None:
+        raise ValueError("Invalid file type. Only JPEG and PNG are allowed.")
+
+    from PIL import Image
+
+    fp.seek(0)
+    try:
+        with Image.open(fp, formats=[image_format]) as img:
+            width, height = img.size
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError("The uploaded file could not be read as an image.") from e
+
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValueError(
+            f"Image too large. Maximum size is {settings.IMAGE_MAX_PIXELS // 1_000_000} megapixels."
+        )
+    return ImageInfo(image_format, MIME_TYPES[image_format], width, height)
+
+
+def _resize(image_content: bytes, max_edge: int, output_format: str, quality: int) -> tuple[bytes, int, int]:
+    """Decode, orient, flatten to RGB, shrink to ``max_edge`` and re-encode.
+
+    Returns (data, width, height). Raises ValueError if the bytes are not a
+    readable image.
+    """
+    # Pillow is imported on first use to keep it out of the server's cold start
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(BytesIO(image_content)) as img:
+            if img.width * img.height > settings.IMAGE_MAX_PIXELS:
+                raise ValueError("Image has too many pixels")
+
+            # Let the JPEG decoder scale down while decoding (much cheaper
+            # than decoding at full resolution and resizing afterwards)
+            img.draft("RGB", (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            buffer = BytesIO()
+            img.save(buffer, format=output_format, quality=quality)
+            width, height = img.size
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image: {e}") from e
+    return buffer.getvalue(), width, height
+
+
+def normalize_image(image_content: bytes) -> PreparedImage:
+    """Decode, orient, downsize and re-encode an uploaded image.
+
+    The image is decoded once, rotated according to its EXIF orientation,
+    shrunk so its longest edge is at most ``IMAGE_MAX_EDGE`` and re-encoded
+    without metadata. Raises ValueError if the bytes are not a readable image.
+    """
+    output_format = settings.IMAGE_FORMAT.upper()
+    data, width, height = _resize(
+        image_content, settings.IMAGE_MAX_EDGE, output_format, settings.IMAGE_QUALITY
+    )
+
+    detail = "low" if max(width, height) <= settings.IMAGE_LOW_DETAIL_MAX_EDGE else "high"
+    return PreparedImage(
+        data=data,
+        mime_type=MIME_TYPES[output_format],
+        width=width,
+        height=height,
+        detail=detail,
+    )
+
+
+def make_thumbnail(image_content: bytes) -> bytes:
+    """Compact JPEG thumbnail (longest edge ``THUMBNAIL_MAX_EDGE``) of an image"""
+    data, _, _ = _resize(
+        image_content, settings.THUMBNAIL_MAX_EDGE, "JPEG", settings.THUMBNAIL_QUALITY
+    )
+    return data